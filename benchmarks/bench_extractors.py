@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Compare native in-process extractors with textract, per file format.
+
+Usage: python benchmarks/bench_extractors.py FILE [FILE ...] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+# Setup Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'revision_platform.settings')
+import django
+django.setup()
+
+from learning.extraction import EXTRACTORS, iter_textract_pages
+from learning.utils import get_file_type
+
+
+def time_extractor(extract, file_path, repeat):
+    """Return (best seconds, characters extracted) over `repeat` runs"""
+    best = None
+    chars = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chars = sum(len(page) for page in extract(file_path))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    totals = defaultdict(lambda: {'bytes': 0, 'native': 0.0, 'textract': 0.0})
+
+    print(f"{'file':40} {'type':6} {'native s':>10} {'textract s':>11} {'speedup':>8}")
+    for file_path in args.files:
+        file_type = get_file_type(file_path)
+        native = EXTRACTORS.get(file_type)
+        if native is None:
+            print(f"{os.path.basename(file_path):40} {file_type:6} no native extractor, skipped")
+            continue
+
+        native_time, native_chars = time_extractor(native, file_path, args.repeat)
+        textract_time, textract_chars = time_extractor(iter_textract_pages, file_path, args.repeat)
+
+        size = os.path.getsize(file_path)
+        totals[file_type]['bytes'] += size
+        totals[file_type]['native'] += native_time
+        totals[file_type]['textract'] += textract_time
+
+        print(
+            f"{os.path.basename(file_path)[:40]:40} {file_type:6} {native_time:10.4f} {textract_time:11.4f} "
+            f"{textract_time / max(native_time, 1e-9):7.1f}x  ({native_chars} vs {textract_chars} chars)"
+        )
+
+    print("\nThroughput per format (MB/s)")
+    for file_type, data in sorted(totals.items()):
+        mb = data['bytes'] / (1024 * 1024)
+        print(
+            f"  {file_type:6} native {mb / max(data['native'], 1e-9):8.2f}   "
+            f"textract {mb / max(data['textract'], 1e-9):8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Count database round trips when persisting a generated quiz.
+
+Compares the former row-by-row persistence (one INSERT per question and
+per option) with QuizGenerator's bulk persistence. Everything runs in a
+transaction that is rolled back, so the database is left untouched.
+
+Usage: python benchmarks/bench_quiz_persistence.py [--questions 40]
+"""
+import argparse
+import os
+import sys
+import time
+
+# Setup Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'revision_platform.settings')
+import django
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from learning.models import Document, Quiz, Question, QuestionOption
+from learning.quiz_generator import QuizGenerator
+
+
+SAMPLE_SENTENCE = (
+    "The Treaty of Westphalia signed in 1648 established the principle of state sovereignty "
+    "that shaped European diplomacy and International Relations for the following centuries"
+)
+
+
+def persist_row_by_row(quiz, questions):
+    """Previous implementation: one query per question and per option"""
+    for i, question_data in enumerate(questions):
+        question = Question.objects.create(
+            quiz=quiz,
+            question_text=question_data['question'],
+            question_type=question_data['type'],
+            correct_answer=question_data['correct_answer'],
+            explanation=question_data.get('explanation', ''),
+            points=question_data.get('points', 1),
+            order=i + 1
+        )
+        if question_data['type'] == 'multiple_choice' and 'options' in question_data:
+            for j, option in enumerate(question_data['options']):
+                QuestionOption.objects.create(
+                    question=question,
+                    option_text=option['text'],
+                    is_correct=option['is_correct'],
+                    order=j + 1
+                )
+
+
+def measure(label, func):
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+    print(f"{label:12} {len(queries.captured_queries):5d} queries  {elapsed * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--questions', type=int, default=40)
+    args = parser.parse_args()
+
+    with transaction.atomic():
+        user = User.objects.create(username='bench_quiz_persistence')
+        document = Document.objects.create(
+            title='Benchmark document',
+            file='documents/benchmark.txt',
+            document_type='txt',
+            uploaded_by=user,
+            extracted_text='. '.join([SAMPLE_SENTENCE] * 200),
+            is_processed=True,
+        )
+        generator = QuizGenerator(document)
+        questions = generator._generate_questions(args.questions, 'easy')
+        options = sum(len(q.get('options', [])) for q in questions)
+        print(f"{len(questions)} questions, {options} options")
+
+        def row_by_row():
+            quiz = Quiz.objects.create(title='row', document=document, created_by=user)
+            persist_row_by_row(quiz, questions)
+
+        def bulk():
+            with transaction.atomic():
+                quiz = Quiz.objects.create(title='bulk', document=document, created_by=user)
+                generator._bulk_create_questions(quiz, questions)
+
+        measure('row-by-row', row_by_row)
+        measure('bulk', bulk)
+
+        transaction.set_rollback(True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Compare the answer similarity backends on a synthetic answer corpus.
+
+Builds reference answers of increasing length and student answers derived
+from them (typos, dropped and reordered words, unrelated answers), then
+reports the grading time of each backend and, per kind of answer, how far
+the indel ratio is from difflib's and how many grading outcomes change.
+
+Usage: python benchmarks/bench_similarity.py [--pairs 2000] [--seed 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+# Setup Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'revision_platform.settings')
+import django
+django.setup()
+
+from learning.answer_checker import SmartAnswerChecker, compile_text
+from learning.similarity import BACKENDS
+
+
+VOCABULARY = (
+    "photosynthesis chlorophyll energy light glucose oxygen carbon dioxide plant cell membrane "
+    "mitochondria respiration enzyme protein nucleus division treaty sovereignty revolution "
+    "parliament economy inflation market demand supply equation derivative integral vector "
+    "the a of and in to is by for with from which that"
+).split()
+
+# Answer lengths in words, from a fill-in-the-blank to a long short answer
+LENGTHS = (1, 3, 8, 20, 60, 150)
+
+KINDS = ('exact', 'typos', 'dropped', 'reordered', 'unrelated')
+
+
+def typo(word, rng):
+    if len(word) < 2:
+        return word
+    i = rng.randrange(len(word) - 1)
+    edit = rng.choice(('swap', 'drop', 'replace'))
+    if edit == 'swap':
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if edit == 'drop':
+        return word[:i] + word[i + 1:]
+    return word[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz') + word[i + 1:]
+
+
+def make_answer(reference, kind, rng):
+    """A student answer of some kind, derived from (or unrelated to) the reference"""
+    words = reference.split()
+    if kind == 'typos':
+        words = [typo(word, rng) if rng.random() < 0.2 else word for word in words]
+    elif kind == 'dropped':
+        words = [word for word in words if rng.random() > 0.3] or words[:1]
+    elif kind == 'reordered':
+        rng.shuffle(words)
+    elif kind == 'unrelated':
+        words = [rng.choice(VOCABULARY) for _ in words]
+    return ' '.join(words)
+
+
+def build_corpus(pairs, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(pairs):
+        length = rng.choice(LENGTHS)
+        reference = ' '.join(rng.choice(VOCABULARY) for _ in range(length))
+        kind = rng.choice(KINDS)
+        corpus.append((kind, compile_text(reference), compile_text(make_answer(reference, kind, rng))))
+    return corpus
+
+
+def grade(score, checker):
+    """Outcome of _check_short_answer for a similarity score"""
+    if score >= checker.similarity_threshold:
+        return 'correct'
+    if score >= checker.partial_credit_threshold:
+        return 'partial'
+    return 'other'
+
+
+def time_scores(checker, corpus, score_cutoff=0.0):
+    """Return (seconds, scores) of one pass over the corpus"""
+    start = time.perf_counter()
+    scores = [checker._similarity(ref, answer, score_cutoff=score_cutoff) for _, ref, answer in corpus]
+    return time.perf_counter() - start, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pairs', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.pairs, args.seed)
+    checkers = {name: SmartAnswerChecker(name) for name in BACKENDS}
+    reference = checkers['sequence_matcher']
+    _, reference_scores = time_scores(reference, corpus)
+
+    print(f"{len(corpus)} answer pairs, up to {max(LENGTHS)} words")
+    print(f"{'backend':18} {'full s':>8} {'cutoff s':>9} {'changed':>8}")
+    outcomes = {}
+    for name, checker in checkers.items():
+        full_time, scores = time_scores(checker, corpus)
+        # As graded: give up once partial credit is out of reach
+        cutoff_time, cutoff_scores = time_scores(checker, corpus, checker.partial_credit_threshold)
+        assert all(
+            grade(score, checker) == grade(full, checker) for score, full in zip(cutoff_scores, scores)
+        ), "early exit changed a grading outcome"
+
+        outcomes[name] = [grade(score, checker) != grade(expected, reference)
+                          for score, expected in zip(scores, reference_scores)]
+        print(f"{name:18} {full_time:8.3f} {cutoff_time:9.3f} {sum(outcomes[name]):8d}")
+
+    # Ratios are compared without difflib's autojunk, which only kicks in on
+    # texts of 200+ characters; outcome changes on such texts are counted apart
+    indel = checkers['indel'].similarity_backend
+    by_kind = defaultdict(list)
+    for (kind, ref, answer), changed in zip(corpus, outcomes['indel']):
+        diff = indel.ratio(ref.normalized, answer.normalized) - SequenceMatcher(
+            None, ref.normalized, answer.normalized, autojunk=False
+        ).ratio()
+        long_text = max(len(ref.normalized), len(answer.normalized)) >= 200
+        by_kind[kind].append((diff, changed and not long_text, changed and long_text))
+
+    print()
+    print(f"{'answer kind':12} {'pairs':>6} {'equal':>6} {'max diff':>9} {'mean diff':>10} "
+          f"{'changed':>8} {'changed 200+':>13}")
+    for kind in KINDS:
+        rows = by_kind[kind]
+        diffs = [diff for diff, _, _ in rows]
+        print(
+            f"{kind:12} {len(rows):6d} {sum(diff < 1e-9 for diff in diffs):6d} {max(diffs, default=0):9.4f} "
+            f"{sum(diffs) / max(len(diffs), 1):10.4f} {sum(row[1] for row in rows):8d} "
+            f"{sum(row[2] for row in rows):13d}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,17 @@
 from django.contrib import admin
 from .models import (
     Document, Quiz, Question, QuestionOption, QuizAttempt, 
-    UserAnswer, PerformanceMetrics, StudyGoal
+    UserAnswer, PerformanceMetrics, StudyGoal, ProcessingJob, ExtractionCache, QuizVariant,
+    LLMResponseCache,
 )
+from .jobs import enqueue_regrade
+
+
+def _report_regrade(modeladmin, request, job):
+    modeladmin.message_user(
+        request,
+        f"Regrade queued as job #{job.pk}; scores are updated once the run_jobs worker has processed it.",
+    )
 
 
 @admin.register(Document)
@@ -10,9 +19,15 @@ class DocumentAdmin(admin.ModelAdmin):
     list_display = ['title', 'document_type', 'uploaded_by', 'word_count', 'is_processed', 'created_at']
     list_filter = ['document_type', 'is_processed', 'created_at']
     search_fields = ['title', 'description', 'uploaded_by__username']
-    readonly_fields = ['word_count', 'extracted_text', 'created_at', 'updated_at']
+    readonly_fields = [
+        'word_count', 'character_count', 'sentence_count', 'paragraph_count',
+        'content_hash', 'extracted_text', 'created_at', 'updated_at',
+    ]
     ordering = ['-created_at']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).without_text()
+
 
 class QuestionOptionInline(admin.TabularInline):
     model = QuestionOption
@@ -30,10 +45,15 @@ class QuestionInline(admin.StackedInline):
 class QuizAdmin(admin.ModelAdmin):
     list_display = ['title', 'document', 'created_by', 'difficulty', 'total_questions', 'is_active', 'created_at']
     list_filter = ['difficulty', 'is_active', 'created_at']
-    search_fields = ['title', 'description', 'document__title']
-    readonly_fields = ['total_questions', 'created_at', 'updated_at']
+    search_fields = ['title', 'description', 'document__title', 'variant_id']
+    readonly_fields = ['total_questions', 'seed', 'variant_id', 'created_at', 'updated_at']
     inlines = [QuestionInline]
     ordering = ['-created_at']
+    actions = ['regrade_answers']
+
+    @admin.action(description="Regrade answers to the selected quizzes")
+    def regrade_answers(self, request, queryset):
+        _report_regrade(self, request, enqueue_regrade(quiz_ids=queryset.values_list('pk', flat=True)))
 
 
 @admin.register(Question)
@@ -43,11 +63,16 @@ class QuestionAdmin(admin.ModelAdmin):
     search_fields = ['question_text', 'quiz__title']
     inlines = [QuestionOptionInline]
     ordering = ['quiz', 'order']
+    actions = ['regrade_answers']
 
     def question_text_short(self, obj):
         return obj.question_text[:50] + "..." if len(obj.question_text) > 50 else obj.question_text
     question_text_short.short_description = 'Question Text'
 
+    @admin.action(description="Regrade answers to the selected questions")
+    def regrade_answers(self, request, queryset):
+        _report_regrade(self, request, enqueue_regrade(question_ids=queryset.values_list('pk', flat=True)))
+
 
 @admin.register(QuestionOption)
 class QuestionOptionAdmin(admin.ModelAdmin):
@@ -105,4 +130,42 @@ class StudyGoalAdmin(admin.ModelAdmin):
     list_filter = ['goal_type', 'is_achieved', 'deadline']
     search_fields = ['user__username']
     readonly_fields = ['created_at', 'achieved_at']
-    ordering = ['-created_at']
\ No newline at end of file
+    ordering = ['-created_at']
+
+
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'job_type', 'document', 'status', 'priority', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['job_type', 'status', 'created_at']
+    search_fields = ['document__title', 'last_error']
+    readonly_fields = ['attempts', 'locked_by', 'locked_at', 'created_at', 'started_at', 'finished_at']
+    ordering = ['-created_at']
+
+
+@admin.register(ExtractionCache)
+class ExtractionCacheAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'word_count', 'hit_count', 'created_at', 'last_used_at']
+    search_fields = ['content_hash']
+    readonly_fields = ['content_hash', 'extracted_text', 'word_count', 'hit_count', 'created_at', 'last_used_at']
+    ordering = ['-last_used_at']
+
+
+@admin.register(QuizVariant)
+class QuizVariantAdmin(admin.ModelAdmin):
+    list_display = ['variant_id', 'difficulty', 'num_questions', 'seed', 'hit_count', 'created_at', 'last_used_at']
+    list_filter = ['difficulty']
+    search_fields = ['variant_id', 'content_hash']
+    readonly_fields = [
+        'variant_id', 'content_hash', 'difficulty', 'num_questions', 'seed',
+        'questions', 'hit_count', 'created_at', 'last_used_at',
+    ]
+    ordering = ['-last_used_at']
+
+
+@admin.register(LLMResponseCache)
+class LLMResponseCacheAdmin(admin.ModelAdmin):
+    list_display = ['prompt_hash', 'model', 'hit_count', 'created_at', 'last_used_at', 'expires_at']
+    list_filter = ['model']
+    search_fields = ['prompt_hash']
+    readonly_fields = ['prompt_hash', 'model', 'response', 'hit_count', 'created_at', 'last_used_at', 'expires_at']
+    ordering = ['-last_used_at']
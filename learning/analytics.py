@@ -142,7 +142,9 @@ class LearningAnalytics:
         """Get performance breakdown by document/subject"""
         performance_metrics = PerformanceMetrics.objects.filter(
             user=self.user
-        ).select_related('document').order_by('-average_score')
+        ).select_related('document').defer(
+            'document__extracted_text', 'document__search_vector'
+        ).order_by('-average_score')
         
         subject_data = []
         for metric in performance_metrics:
@@ -400,7 +402,7 @@ class SystemAnalytics:
         ).aggregate(avg=Avg('score'))['avg'] or 0
         
         # Most popular documents
-        popular_docs = Document.objects.annotate(
+        popular_docs = Document.objects.without_text().select_related('uploaded_by').annotate(
             quiz_count=Count('quizzes')
         ).order_by('-quiz_count')[:5]
         
@@ -1,15 +1,223 @@
 import re
-from typing import Tuple, List
-from difflib import SequenceMatcher
-from .models import Question, QuestionOption
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, Mapping, NamedTuple, Optional, Tuple, List
+from django.conf import settings
+from django.db.models import QuerySet
+from .models import Question, QuestionOption, UserAnswer
+from .similarity import get_similarity_backend
+
+
+WHITESPACE_RE = re.compile(r'\s+')
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, collapse whitespace and drop punctuation"""
+    text = text.lower()
+    text = WHITESPACE_RE.sub(' ', text)
+    text = PUNCTUATION_RE.sub('', text)
+    return text.strip()
+
+
+class CompiledText(NamedTuple):
+    """A text prepared once for every comparison made against it"""
+    text: str
+    normalized: str
+    tokens: FrozenSet[str]
+    # Words of more than 3 characters, in order (see _check_keywords)
+    keywords: Tuple[str, ...]
+
+
+def compile_text(text: str) -> CompiledText:
+    normalized = normalize_text(text)
+    words = normalized.split()
+    return CompiledText(text, normalized, frozenset(words), tuple(word for word in words if len(word) > 3))
+
+
+class OptionKey(NamedTuple):
+    text: str
+    is_correct: bool
+    compiled: CompiledText
+
+
+class AnswerKey(NamedTuple):
+    """Immutable, precompiled snapshot of what grading needs from a question"""
+    question_id: int
+    quiz_id: int
+    correct_answer: CompiledText
+    options: Tuple[OptionKey, ...]
+    correct_index: Optional[int]
+    # Lowercased option text -> index of its first option
+    option_lookup: Mapping[str, int]
+    # Question.key_version the key was compiled from
+    version: int = 0
+    
+    @property
+    def correct_option(self) -> Optional[str]:
+        if self.correct_index is None:
+            return None
+        return self.options[self.correct_index].text
+
+
+def build_answer_key(question_id: int, quiz_id: int, correct_answer: str,
+                     options: Iterable[Tuple[str, bool]], version: int = 0) -> AnswerKey:
+    """Compile an answer key from the correct answer and (option_text, is_correct) pairs in display order"""
+    option_keys = tuple(OptionKey(text, is_correct, compile_text(text)) for text, is_correct in options)
+    correct_index = next((i for i, option in enumerate(option_keys) if option.is_correct), None)
+    lookup = {}
+    for i, option in enumerate(option_keys):
+        lookup.setdefault(option.text.lower(), i)
+    return AnswerKey(
+        question_id, quiz_id, compile_text(correct_answer.strip()),
+        option_keys, correct_index, MappingProxyType(lookup), version,
+    )
+
+
+def load_answer_keys(quiz_ids: Iterable[int]) -> Dict[int, Dict[int, AnswerKey]]:
+    """Answer keys of every question of some quizzes: {quiz_id: {question_id: key}}, in two queries"""
+    quiz_ids = list(quiz_ids)
+    options = {}
+    rows = (
+        QuestionOption.objects.filter(question__quiz_id__in=quiz_ids)
+        .order_by('question_id', 'order', 'pk')
+        .values_list('question_id', 'option_text', 'is_correct')
+    )
+    for question_id, option_text, is_correct in rows:
+        options.setdefault(question_id, []).append((option_text, is_correct))
+    
+    keys = {quiz_id: {} for quiz_id in quiz_ids}
+    questions = Question.objects.filter(quiz_id__in=quiz_ids).values_list(
+        'pk', 'quiz_id', 'correct_answer', 'key_version'
+    )
+    for question_id, quiz_id, correct_answer, version in questions:
+        keys[quiz_id][question_id] = build_answer_key(
+            question_id, quiz_id, correct_answer, options.get(question_id, []), version
+        )
+    return keys
+
+
+class AnswerKeyCache:
+    """Process-local LRU of compiled answer keys, by quiz
+    
+    Entries are dropped by the Question/QuestionOption save and delete
+    signals (see signals.py). Other processes notice such changes through
+    Question.key_version, which the same signals bump (see get_answer_key);
+    `ttl` bounds how long changes made without signals (bulk updates) go
+    unnoticed.
+    """
+    
+    def __init__(self, max_quizzes: int = 256, ttl: float = 300):
+        self.max_quizzes = max_quizzes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._quiz_of_question = {}
+        self._lock = threading.Lock()
+    
+    def get_quiz(self, quiz_id: int) -> Optional[Dict[int, AnswerKey]]:
+        with self._lock:
+            entry = self._entries.get(quiz_id)
+            if entry is None:
+                return None
+            loaded_at, keys = entry
+            if time.monotonic() - loaded_at > self.ttl:
+                self._remove(quiz_id)
+                return None
+            self._entries.move_to_end(quiz_id)
+            return keys
+    
+    def put(self, quiz_id: int, keys: Dict[int, AnswerKey]):
+        with self._lock:
+            self._remove(quiz_id)
+            self._entries[quiz_id] = (time.monotonic(), keys)
+            for question_id in keys:
+                self._quiz_of_question[question_id] = quiz_id
+            while len(self._entries) > self.max_quizzes:
+                self._remove(next(iter(self._entries)))
+    
+    def invalidate_quiz(self, quiz_id: int):
+        with self._lock:
+            self._remove(quiz_id)
+    
+    def invalidate_question(self, question_id: int):
+        with self._lock:
+            quiz_id = self._quiz_of_question.get(question_id)
+            if quiz_id is not None:
+                self._remove(quiz_id)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._quiz_of_question.clear()
+    
+    def _remove(self, quiz_id: int):
+        entry = self._entries.pop(quiz_id, None)
+        if entry is not None:
+            for question_id in entry[1]:
+                self._quiz_of_question.pop(question_id, None)
+
+
+answer_key_cache = AnswerKeyCache(
+    max_quizzes=getattr(settings, 'ANSWER_KEY_CACHE_SIZE', 256),
+    ttl=getattr(settings, 'ANSWER_KEY_CACHE_TTL_SECONDS', 300),
+)
+
+
+def get_quiz_answer_keys(quiz_ids: Iterable[int]) -> Dict[int, Dict[int, AnswerKey]]:
+    """Answer keys of some quizzes, from the cache or loaded together"""
+    result = {}
+    missing = []
+    for quiz_id in set(quiz_ids):
+        keys = answer_key_cache.get_quiz(quiz_id)
+        if keys is None:
+            missing.append(quiz_id)
+        else:
+            result[quiz_id] = keys
+    if missing:
+        for quiz_id, keys in load_answer_keys(missing).items():
+            answer_key_cache.put(quiz_id, keys)
+            result[quiz_id] = keys
+    return result
 
 
 class SmartAnswerChecker:
-    """Enhanced answer checking with fuzzy matching and intelligent scoring"""
+    """Enhanced answer checking with fuzzy matching and intelligent scoring
     
-    def __init__(self):
+    Answers are compared against compiled answer keys, loaded for a whole
+    quiz at once and cached per process, so checking an answer neither
+    queries the database nor normalizes the reference texts again.
+    """
+    
+    def __init__(self, similarity_backend: str = None):
         self.similarity_threshold = 0.8
         self.partial_credit_threshold = 0.6
+        self.similarity_backend = get_similarity_backend(similarity_backend)
+    
+    def prefetch_answer_keys(self, questions: Iterable[Question]):
+        """Load the answer keys of the questions' quizzes that are not cached yet"""
+        get_quiz_answer_keys(question.quiz_id for question in questions)
+    
+    def get_answer_key(self, question: Question) -> AnswerKey:
+        keys = get_quiz_answer_keys([question.quiz_id])[question.quiz_id]
+        key = keys.get(question.pk)
+        if key is not None and key.version == question.key_version:
+            return key
+        
+        # Unknown, or the question or its options changed since it was cached
+        # (e.g. saved by another process)
+        answer_key_cache.invalidate_quiz(question.quiz_id)
+        keys = get_quiz_answer_keys([question.quiz_id])[question.quiz_id]
+        key = keys.get(question.pk)
+        if key is None:
+            # Not saved yet: compile it from the instance
+            key = build_answer_key(
+                question.pk, question.quiz_id, question.correct_answer,
+                [(opt.option_text, opt.is_correct) for opt in question.options.all()] if question.pk else [],
+                question.key_version,
+            )
+        return key
         
     def check_answer(self, question: Question, user_answer: str) -> Tuple[bool, int, dict]:
         """
@@ -34,29 +242,34 @@ class SmartAnswerChecker:
     def _check_multiple_choice(self, question: Question, user_answer: str) -> Tuple[bool, int, dict]:
         """Check multiple choice answer"""
         try:
+            answer_key = self.get_answer_key(question)
+            answer = compile_text(user_answer)
+            
             # Find the selected option
             selected_option = None
-            for option in question.options.all():
-                if self._fuzzy_match(option.option_text, user_answer) > 0.9:
+            for option in answer_key.options:
+                if self._similarity(option.compiled, answer, score_cutoff=0.9) > 0.9:
                     selected_option = option
                     break
             
             if not selected_option:
                 # Try exact match
-                selected_option = question.options.filter(option_text__iexact=user_answer).first()
+                index = answer_key.option_lookup.get(user_answer.lower())
+                if index is not None:
+                    selected_option = answer_key.options[index]
             
             if selected_option:
                 if selected_option.is_correct:
                     return True, question.points, {
                         "feedback": "Correct answer!",
-                        "selected_option": selected_option.option_text
+                        "selected_option": selected_option.text
                     }
                 else:
-                    correct_option = question.options.filter(is_correct=True).first()
+                    correct_option = answer_key.correct_option
                     return False, 0, {
-                        "feedback": f"Incorrect. The correct answer is: {correct_option.option_text if correct_option else 'Not found'}",
-                        "selected_option": selected_option.option_text,
-                        "correct_option": correct_option.option_text if correct_option else None
+                        "feedback": f"Incorrect. The correct answer is: {correct_option if correct_option else 'Not found'}",
+                        "selected_option": selected_option.text,
+                        "correct_option": correct_option
                     }
             else:
                 return False, 0, {"feedback": "Invalid option selected"}
@@ -92,11 +305,12 @@ class SmartAnswerChecker:
     
     def _check_short_answer(self, question: Question, user_answer: str) -> Tuple[bool, int, dict]:
         """Check short answer with intelligent scoring"""
-        correct_answer = question.correct_answer.strip()
-        user_answer = user_answer.strip()
+        reference = self.get_answer_key(question).correct_answer
+        correct_answer = reference.text
+        answer = compile_text(user_answer.strip())
         
-        # Calculate similarity
-        similarity = self._fuzzy_match(correct_answer, user_answer)
+        # Calculate similarity; below partial credit only keywords count
+        similarity = self._similarity(reference, answer, score_cutoff=self.partial_credit_threshold)
         
         # Check for exact match
         if similarity >= 0.95:
@@ -123,7 +337,7 @@ class SmartAnswerChecker:
         
         # Check for keyword matching
         else:
-            keyword_score = self._check_keywords(correct_answer, user_answer)
+            keyword_score = self._keyword_score(reference, answer)
             if keyword_score >= 0.5:
                 partial_points = int(question.points * 0.5)  # 50% credit
                 return False, partial_points, {
@@ -140,11 +354,12 @@ class SmartAnswerChecker:
     
     def _check_fill_blank(self, question: Question, user_answer: str) -> Tuple[bool, int, dict]:
         """Check fill-in-the-blank answer"""
-        correct_answer = question.correct_answer.strip()
-        user_answer = user_answer.strip()
+        reference = self.get_answer_key(question).correct_answer
+        correct_answer = reference.text
+        answer = compile_text(user_answer.strip())
         
         # Calculate similarity
-        similarity = self._fuzzy_match(correct_answer, user_answer)
+        similarity = self._similarity(reference, answer, score_cutoff=0.6)
         
         # More lenient matching for fill-in-the-blank
         if similarity >= 0.8:
@@ -168,62 +383,57 @@ class SmartAnswerChecker:
     
     def _fuzzy_match(self, text1: str, text2: str) -> float:
         """Calculate fuzzy string similarity"""
-        if not text1 or not text2:
-            return 0.0
-        
-        # Normalize texts
-        text1_norm = self._normalize_text(text1)
-        text2_norm = self._normalize_text(text2)
+        return self._similarity(compile_text(text1), compile_text(text2))
+    
+    def _similarity(self, reference: CompiledText, answer: CompiledText, score_cutoff: float = 0.0) -> float:
+        """Fuzzy similarity of two compiled texts
         
-        # Calculate similarity using different methods
-        sequence_similarity = SequenceMatcher(None, text1_norm, text2_norm).ratio()
+        Scores below `score_cutoff` are returned as 0.0, so the character
+        comparison is skipped when it cannot lift the score to the cutoff.
+        """
+        if not reference.text or not answer.text:
+            return 0.0
         
         # Word-based similarity
-        words1 = set(text1_norm.split())
-        words2 = set(text2_norm.split())
+        words1 = reference.tokens
+        words2 = answer.tokens
         
         if words1 and words2:
-            word_similarity = len(words1.intersection(words2)) / len(words1.union(words2))
+            word_similarity = len(words1 & words2) / len(words1 | words2)
         else:
             word_similarity = 0.0
         
+        # Character similarity the sequence score needs to reach the cutoff
+        sequence_cutoff = max((score_cutoff - word_similarity * 0.4) / 0.6 - 1e-9, 0.0)
+        if sequence_cutoff > 1.0:
+            return 0.0
+        sequence_similarity = self.similarity_backend.ratio(
+            reference.normalized, answer.normalized, score_cutoff=sequence_cutoff
+        )
+        
         # Combined similarity (weighted average)
         combined_similarity = (sequence_similarity * 0.6) + (word_similarity * 0.4)
         
-        return combined_similarity
+        return combined_similarity if combined_similarity >= score_cutoff else 0.0
     
     def _normalize_text(self, text: str) -> str:
         """Normalize text for comparison"""
-        # Convert to lowercase
-        text = text.lower()
-        
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove punctuation
-        text = re.sub(r'[^\w\s]', '', text)
-        
-        # Strip whitespace
-        text = text.strip()
-        
-        return text
+        return normalize_text(text)
     
     def _check_keywords(self, correct_answer: str, user_answer: str) -> float:
         """Check for important keywords in the answer"""
-        # Extract important words (longer than 3 characters)
-        correct_words = [word for word in self._normalize_text(correct_answer).split() if len(word) > 3]
-        user_words = [word for word in self._normalize_text(user_answer).split() if len(word) > 3]
-        
-        if not correct_words:
+        return self._keyword_score(compile_text(correct_answer), compile_text(user_answer))
+    
+    def _keyword_score(self, reference: CompiledText, answer: CompiledText) -> float:
+        """Share of the reference keywords (words longer than 3 characters) found in the answer"""
+        if not reference.keywords:
             return 0.0
         
         # Count matching keywords
-        matches = 0
-        for word in correct_words:
-            if word in user_words:
-                matches += 1
+        user_words = answer.tokens
+        matches = sum(1 for word in reference.keywords if word in user_words)
         
-        return matches / len(correct_words)
+        return matches / len(reference.keywords)
     
     def get_answer_feedback(self, question: Question, user_answer: str, is_correct: bool, points_earned: int) -> dict:
         """Generate detailed feedback for the answer"""
@@ -239,8 +449,43 @@ class SmartAnswerChecker:
         }
         
         if question.question_type == 'multiple_choice':
-            correct_option = question.options.filter(is_correct=True).first()
-            feedback["correct_option"] = correct_option.option_text if correct_option else None
-            feedback["all_options"] = [opt.option_text for opt in question.options.all()]
+            answer_key = self.get_answer_key(question)
+            feedback["correct_option"] = answer_key.correct_option
+            feedback["all_options"] = [option.text for option in answer_key.options]
         
-        return feedback
\ No newline at end of file
+        return feedback
+
+# Shared by every request of the process: the checker holds no per-answer state
+default_checker = SmartAnswerChecker()
+
+
+def grade_batch(answers: Iterable[UserAnswer], checker: SmartAnswerChecker = None) -> List[UserAnswer]:
+    """Grade user answers in one pass and save the changed ones with a single bulk_update
+    
+    Answers should come with their question (select_related); a queryset is
+    given one. Returns the answers whose is_correct/points_earned changed.
+    """
+    checker = checker or default_checker
+    if isinstance(answers, QuerySet):
+        answers = answers.select_related('question')
+    answers = list(answers)
+    checker.prefetch_answer_keys(answer.question for answer in answers)
+    
+    changed = []
+    for answer in answers:
+        is_correct, points_earned, _ = checker.check_answer(answer.question, answer.user_answer)
+        if answer.is_correct != is_correct or answer.points_earned != points_earned:
+            answer.is_correct = is_correct
+            answer.points_earned = points_earned
+            changed.append(answer)
+    
+    if changed:
+        UserAnswer.objects.bulk_update(changed, ['is_correct', 'points_earned'], batch_size=1000)
+    return changed
+
+
+def grade_attempt(attempt, checker: SmartAnswerChecker = None) -> List[UserAnswer]:
+    """Grade every answer of a quiz attempt against the current answer keys; returns all its answers"""
+    answers = list(attempt.answers.select_related('question'))
+    grade_batch(answers, checker)
+    return answers
@@ -0,0 +1,187 @@
+import random
+from array import array
+from collections import Counter, OrderedDict
+from typing import Dict, List
+
+
+# Term categories: distractors are drawn from the same category as the answer
+NUMBER = 'N'
+MULTIWORD = 'M'
+PROPER = 'P'
+WORD = 'W'
+
+# Most co-occurring terms kept per term in the stored index
+COOCCURRENCE_LIMIT = 10
+
+# While counting, a term's co-occurrence counter is cut back to its most common
+# COOCCURRENCE_KEEP entries once it grows past COOCCURRENCE_PRUNE_AT
+COOCCURRENCE_KEEP = 4 * COOCCURRENCE_LIMIT
+COOCCURRENCE_PRUNE_AT = 16 * COOCCURRENCE_LIMIT
+
+# Most frequent terms of a category sampled from when co-occurrence is not enough
+CATEGORY_POOL_SIZE = 50
+
+GENERIC_DISTRACTORS = [
+    "None of the above",
+    "All of the above",
+    "Cannot be determined",
+    "Not mentioned in the text",
+]
+
+# Engines kept in memory per process, keyed by (document id, index build time)
+ENGINE_CACHE_SIZE = 32
+_engine_cache = OrderedDict()
+
+
+def categorize_term(term: str) -> str:
+    """Category of a key term: number, multi-word term, proper noun or plain word"""
+    if term.isdigit():
+        return NUMBER
+    if ' ' in term:
+        return MULTIWORD
+    if term[:1].isupper():
+        return PROPER
+    return WORD
+
+
+class TermIndexBuilder:
+    """Count term frequencies and same-sentence co-occurrences across a document
+
+    Co-occurrence counters are pruned as they grow, keeping the memory per
+    term bounded at the cost of approximate counts for rare pairs.
+    """
+
+    def __init__(self, cooccurrence_limit: int = COOCCURRENCE_LIMIT):
+        self.cooccurrence_limit = cooccurrence_limit
+        self.term_ids = {}
+        self.terms = []
+        self.frequencies = []
+        self.cooccurrence = []
+
+    def _term_id(self, term: str) -> int:
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            term_id = self.term_ids[term] = len(self.terms)
+            self.terms.append(term)
+            self.frequencies.append(0)
+            self.cooccurrence.append(Counter())
+        return term_id
+
+    def add_sentence(self, terms: List[str]):
+        ids = [self._term_id(term) for term in terms]
+        for term_id in ids:
+            self.frequencies[term_id] += 1
+            counter = self.cooccurrence[term_id]
+            for other_id in ids:
+                if other_id != term_id:
+                    counter[other_id] += 1
+            if len(counter) > COOCCURRENCE_PRUNE_AT:
+                self.cooccurrence[term_id] = Counter(dict(counter.most_common(COOCCURRENCE_KEEP)))
+
+    def finish(self) -> Dict:
+        return {
+            'terms': self.terms,
+            'frequencies': self.frequencies,
+            'categories': ''.join(categorize_term(term) for term in self.terms),
+            'cooccurrence': [
+                [other_id for other_id, _ in counter.most_common(self.cooccurrence_limit)]
+                for counter in self.cooccurrence
+            ],
+        }
+
+
+class DistractorEngine:
+    """Pick plausible wrong answers among a document's own key terms
+
+    Built from the term-frequency and co-occurrence data stored in the
+    document's text index. Terms are held in flat arrays indexed by term
+    id, so a lookup is a dict access followed by a few array reads.
+    """
+
+    def __init__(self, terms: List[str], frequencies: List[int], categories: str,
+                 cooccurrence: List[List[int]]):
+        self.terms = terms
+        self.term_ids = {term.lower(): i for i, term in enumerate(terms)}
+        self.frequencies = array('I', frequencies)
+        self.categories = categories
+        self.cooccurrence = [array('I', ids) for ids in cooccurrence]
+
+        by_category = {}
+        for term_id in sorted(range(len(terms)), key=lambda i: -self.frequencies[i]):
+            by_category.setdefault(categories[term_id], array('I')).append(term_id)
+        self.category_pools = {
+            category: ids[:CATEGORY_POOL_SIZE] for category, ids in by_category.items()
+        }
+
+    @classmethod
+    def from_index(cls, data: Dict) -> 'DistractorEngine':
+        return cls(
+            data.get('terms', []),
+            data.get('frequencies', []),
+            data.get('categories', ''),
+            data.get('cooccurrence', []),
+        )
+
+    def distractors(self, answer: str, count: int, rng=random) -> List[str]:
+        """Return `count` distractors for `answer`, best candidates first"""
+        answer_key = answer.lower()
+        category = categorize_term(answer)
+        answer_id = self.term_ids.get(answer_key)
+
+        selected = []
+        seen = {answer_key}
+
+        def take(term_id):
+            term = self.terms[term_id]
+            key = term.lower()
+            if key in seen or key in answer_key or answer_key in key:
+                return
+            seen.add(key)
+            selected.append(term)
+
+        # 1. Terms of the same category appearing in the same sentences
+        if answer_id is not None:
+            for term_id in self.cooccurrence[answer_id]:
+                if self.categories[term_id] == category:
+                    take(term_id)
+                    if len(selected) >= count:
+                        return selected
+
+        # 2. Other frequent terms of the same category
+        pool = self.category_pools.get(category)
+        if pool:
+            for term_id in rng.sample(list(pool), min(len(pool), count * 3)):
+                take(term_id)
+                if len(selected) >= count:
+                    return selected
+
+        # 3. Generic fillers
+        for filler in GENERIC_DISTRACTORS:
+            if filler.lower() not in seen:
+                seen.add(filler.lower())
+                selected.append(filler)
+                if len(selected) >= count:
+                    return selected
+
+        while len(selected) < count:
+            selected.append(f"Option {len(selected) + 1}")
+        return selected
+
+    def distractors_batch(self, answers: List[str], count: int, rng=random) -> List[List[str]]:
+        """Distractors for every answer of a quiz in one call"""
+        return [self.distractors(answer, count, rng) for answer in answers]
+
+
+def get_distractor_engine(document_id: int, index: Dict) -> DistractorEngine:
+    """Process-local cached engine for a document's text index"""
+    key = (document_id, index.get('built_at'))
+    engine = _engine_cache.get(key)
+    if engine is not None:
+        _engine_cache.move_to_end(key)
+        return engine
+
+    engine = DistractorEngine.from_index(index.get('terms') or {})
+    _engine_cache[key] = engine
+    if len(_engine_cache) > ENGINE_CACHE_SIZE:
+        _engine_cache.popitem(last=False)
+    return engine
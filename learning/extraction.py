@@ -0,0 +1,419 @@
+"""
+Streaming text extraction pipeline.
+
+Documents are processed page by page through chained generators
+(extract -> clean -> count words -> persist) so that no stage needs the
+whole document in memory. Each cleaned page is stored as a DocumentChunk
+row, and the sentence index used by the quiz generator is built along the
+way. The full text (Document.extracted_text, ExtractionCache) is then
+assembled from the chunks inside the database.
+"""
+import io
+import logging
+
+import textract
+from django.contrib.postgres.aggregates import StringAgg
+from django.db import transaction
+from django.db.models import Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+from .models import Document, DocumentChunk, DocumentTextIndex, ExtractionCache
+from .quiz_generator import SentenceIndexBuilder, TEXT_INDEX_VERSION, build_text_index, save_text_index
+from .utils import clean_extracted_text, get_file_type
+
+
+logger = logging.getLogger(__name__)
+
+# Registry of in-process extractors: file type (see get_file_type) -> callable(file_path)
+# yielding raw page texts. Unknown types fall back to textract.
+EXTRACTORS = {}
+
+
+# Lines are grouped into pages of roughly this many characters for plain text files
+TEXT_PAGE_SIZE = 64 * 1024
+
+PAGE_BREAK = b'\f'
+
+# Number of DocumentChunk rows written per INSERT
+CHUNK_BATCH_SIZE = 100
+
+# Document fields filled from TextStats
+STATS_FIELDS = ['word_count', 'character_count', 'sentence_count', 'paragraph_count']
+
+
+def extractor(file_type):
+    """Register a native page extractor for a file type"""
+    def decorator(func):
+        EXTRACTORS[file_type] = func
+        return func
+    return decorator
+
+
+def group_into_pages(blocks, page_size=TEXT_PAGE_SIZE):
+    """Join consecutive text blocks (lines, paragraphs) into pages of about `page_size` characters"""
+    buffer = []
+    size = 0
+    for block in blocks:
+        buffer.append(block)
+        size += len(block)
+        if size >= page_size:
+            yield '\n'.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield '\n'.join(buffer)
+
+
+@extractor('txt')
+def iter_text_file_pages(file_path, page_size=TEXT_PAGE_SIZE):
+    """Yield a plain text file in groups of lines of about `page_size` characters"""
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        buffer = []
+        size = 0
+        for line in f:
+            buffer.append(line)
+            size += len(line)
+            if size >= page_size:
+                yield ''.join(buffer)
+                buffer = []
+                size = 0
+        if buffer:
+            yield ''.join(buffer)
+
+
+def iter_textract_pages(file_path):
+    """Yield textract output page by page, decoding one page at a time"""
+    raw = textract.process(file_path)
+    view = memoryview(raw)
+    start = 0
+    while True:
+        end = raw.find(PAGE_BREAK, start)
+        if end == -1:
+            yield str(view[start:], 'utf-8')
+            break
+        yield str(view[start:end], 'utf-8')
+        start = end + 1
+
+
+@extractor('pdf')
+def iter_pdf_pages(file_path):
+    """Yield the text of each PDF page with pdfminer, one page at a time"""
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+
+    resource_manager = PDFResourceManager()
+    output = io.StringIO()
+    device = TextConverter(resource_manager, output, laparams=LAParams())
+    interpreter = PDFPageInterpreter(resource_manager, device)
+    try:
+        with open(file_path, 'rb') as f:
+            for page in PDFPage.get_pages(f):
+                interpreter.process_page(page)
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+    finally:
+        device.close()
+
+
+@extractor('docx')
+def iter_docx_pages(file_path):
+    """Yield the paragraphs and tables of a Word document grouped into pages"""
+    import docx
+
+    document = docx.Document(file_path)
+
+    def blocks():
+        for paragraph in document.paragraphs:
+            yield paragraph.text
+        for table in document.tables:
+            for row in table.rows:
+                yield '\t'.join(cell.text for cell in row.cells)
+
+    return group_into_pages(blocks())
+
+
+@extractor('pptx')
+def iter_pptx_pages(file_path):
+    """Yield the text of each slide of a PowerPoint presentation"""
+    from pptx import Presentation
+
+    presentation = Presentation(file_path)
+    for slide in presentation.slides:
+        texts = []
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                texts.append(shape.text_frame.text)
+            elif getattr(shape, 'has_table', False) and shape.has_table:
+                for row in shape.table.rows:
+                    texts.append('\t'.join(cell.text for cell in row.cells))
+        yield '\n'.join(texts)
+
+
+def _with_textract_fallback(native, file_path):
+    """Fall back to textract when a native extractor fails before producing anything"""
+    try:
+        pages = iter(native(file_path))
+        first = next(pages)
+    except StopIteration:
+        return
+    except Exception as e:
+        logger.warning(f"Native extraction failed for {file_path}, falling back to textract: {e}")
+        yield from iter_textract_pages(file_path)
+        return
+    yield first
+    yield from pages
+
+
+def iter_raw_pages(document):
+    """Extract stage: yield the raw text of a document page by page"""
+    file_path = document.file.path
+    native = EXTRACTORS.get(get_file_type(file_path))
+    if native is None:
+        return iter_textract_pages(file_path)
+    return _with_textract_fallback(native, file_path)
+
+
+def clean_pages(pages):
+    """Clean stage: normalize each page and drop the empty ones"""
+    for page in pages:
+        cleaned = clean_extracted_text(page)
+        if cleaned:
+            yield cleaned
+
+
+def split_text_into_pages(pieces, page_size=TEXT_PAGE_SIZE):
+    """Yield an already extracted text, given as consecutive pieces, in pages of about `page_size` characters
+
+    Pages end at the first line break after `page_size` characters; that
+    line break is dropped (chunks are joined with one).
+    """
+    buffer = ''
+    for piece in pieces:
+        buffer += piece
+        while True:
+            end = buffer.find('\n', page_size)
+            if end == -1:
+                break
+            yield buffer[:end]
+            buffer = buffer[end + 1:]
+    if buffer:
+        yield buffer
+
+
+def iter_cached_text(cached, piece_size=TEXT_PAGE_SIZE):
+    """Yield the text of an ExtractionCache entry piece by piece, read with SUBSTR"""
+    position = 1
+    entry = ExtractionCache.objects.filter(pk=cached.pk)
+    while True:
+        piece = entry.annotate(
+            piece=Substr('extracted_text', position, piece_size)
+        ).values_list('piece', flat=True).first()
+        if not piece:
+            return
+        yield piece
+        position += len(piece)
+
+
+class TextStats:
+    """Count stage: word, character, sentence and paragraph counts in a single pass
+
+    Pages (and the separators between them) are fed in order; the result is
+    the same as splitting the concatenated text, including sentences and
+    paragraphs that span two pieces.
+    """
+
+    def __init__(self):
+        self.word_count = 0
+        self.character_count = 0
+        self.sentence_count = 0
+        self.paragraph_count = 0
+        self._in_sentence = False
+        self._in_paragraph = False
+        self._ends_with_newline = False
+
+    def feed(self, piece):
+        """Count a piece of text and return its number of words"""
+        words = len(piece.split())
+        self.word_count += words
+        self.character_count += len(piece)
+
+        # Sentences: non-blank segments between '.'
+        parts = piece.split('.')
+        self._in_sentence = self._in_sentence or bool(parts[0].strip())
+        for part in parts[1:]:
+            if self._in_sentence:
+                self.sentence_count += 1
+            self._in_sentence = bool(part.strip())
+
+        # Paragraphs: non-blank segments between blank lines
+        text = '\n' + piece if self._ends_with_newline else piece
+        parts = text.split('\n\n')
+        self._in_paragraph = self._in_paragraph or bool(parts[0].strip())
+        for part in parts[1:]:
+            if self._in_paragraph:
+                self.paragraph_count += 1
+            self._in_paragraph = bool(part.strip())
+        if piece:
+            self._ends_with_newline = piece.endswith('\n')
+
+        return words
+
+    def finish(self):
+        """Close the last sentence/paragraph and return the counts"""
+        if self._in_sentence:
+            self.sentence_count += 1
+            self._in_sentence = False
+        if self._in_paragraph:
+            self.paragraph_count += 1
+            self._in_paragraph = False
+        return {
+            'word_count': self.word_count,
+            'character_count': self.character_count,
+            'sentence_count': self.sentence_count,
+            'paragraph_count': self.paragraph_count,
+        }
+
+
+class ChunkWriter:
+    """Persist stage: store pages as ordered DocumentChunk rows, in batches"""
+
+    def __init__(self, document, batch_size=CHUNK_BATCH_SIZE):
+        self.document = document
+        self.batch_size = batch_size
+        self.batch = []
+        self.index = 0
+        self.offset = 0
+
+    def write(self, page, word_count):
+        if self.index:
+            self.offset += 1  # '\n' separator between chunks in the full text
+        self.batch.append(DocumentChunk(
+            document=self.document,
+            index=self.index,
+            start_offset=self.offset,
+            end_offset=self.offset + len(page),
+            word_count=word_count,
+            text=page,
+        ))
+        self.index += 1
+        self.offset += len(page)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            DocumentChunk.objects.bulk_create(self.batch)
+            self.batch = []
+
+
+def store_pages(document, pages):
+    """Replace the document's chunks with `pages` and return their stats
+
+    Cleaned pages are counted and persisted as they arrive; only the
+    current page and the (bounded) sentence index are held in memory.
+    """
+    stats = TextStats()
+    sentence_index = SentenceIndexBuilder()
+
+    with transaction.atomic():
+        DocumentChunk.objects.filter(document=document).delete()
+        writer = ChunkWriter(document)
+        for page in pages:
+            if writer.index:
+                stats.feed('\n')
+                sentence_index.feed('\n')
+            sentence_index.feed(page)
+            writer.write(page, stats.feed(page))
+        writer.flush()
+        save_text_index(document, sentence_index.finish())
+
+    return stats.finish()
+
+
+def chunks_text(document):
+    """Expression for the document text, joined from its chunks by the database"""
+    joined = (
+        DocumentChunk.objects.filter(document=document)
+        .order_by()
+        .values('document')
+        .annotate(text=StringAgg('text', delimiter='\n', ordering='index'))
+        .values('text')
+    )
+    return Coalesce(Subquery(joined), Value(''))
+
+
+def save_text_from_chunks(document):
+    """Set Document.extracted_text from the stored chunks, without loading it"""
+    Document.objects.filter(pk=document.pk).update(extracted_text=chunks_text(document))
+
+
+def save_text_from_cache(document, cached):
+    """Set Document.extracted_text from an ExtractionCache entry, without loading it"""
+    Document.objects.filter(pk=document.pk).update(
+        extracted_text=Subquery(ExtractionCache.objects.filter(pk=cached.pk).values('extracted_text'))
+    )
+
+
+def copy_chunks_from_duplicate(document, cached):
+    """Reuse the chunks of another document with the same content
+
+    Returns the source document's stats, or None if there is no such document.
+    """
+    source = (
+        Document.objects.without_text()
+        .filter(
+            content_hash=document.content_hash,
+            is_processed=True,
+            updated_at__gte=cached.created_at,
+            chunks__isnull=False,
+        )
+        .exclude(pk=document.pk)
+        .distinct()
+        .first()
+    )
+    if source is None:
+        return None
+
+    with transaction.atomic():
+        DocumentChunk.objects.filter(document=document).delete()
+        batch = []
+        for chunk in source.chunks.order_by('index').iterator(chunk_size=CHUNK_BATCH_SIZE):
+            chunk.pk = None
+            chunk.document = document
+            batch.append(chunk)
+            if len(batch) >= CHUNK_BATCH_SIZE:
+                DocumentChunk.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            DocumentChunk.objects.bulk_create(batch)
+
+    source_index = DocumentTextIndex.objects.filter(document=source, version=TEXT_INDEX_VERSION).first()
+    if source_index is not None:
+        save_text_index(document, {
+            'sentences': source_index.sentences,
+            'informative': source_index.informative,
+            'terms': source_index.terms,
+        })
+    else:
+        build_text_index(document)
+
+    return {field: getattr(source, field) for field in STATS_FIELDS}
+
+
+def store_cached_extraction(document, cached):
+    """Build the document's chunks and text from an ExtractionCache entry and return its stats"""
+    stats = copy_chunks_from_duplicate(document, cached)
+    if stats is None:
+        stats = store_pages(document, split_text_into_pages(iter_cached_text(cached)))
+    save_text_from_cache(document, cached)
+    return stats
+
+
+def run_extraction_pipeline(document):
+    """Run extract -> clean -> count -> persist, store the document text and return its stats"""
+    stats = store_pages(document, clean_pages(iter_raw_pages(document)))
+    save_text_from_chunks(document)
+    return stats
@@ -126,6 +126,7 @@ class DocumentSearchForm(forms.Form):
     
     sort_by = forms.ChoiceField(
         choices=[
+            ('relevance', 'Relevance'),
             ('created_at', 'Date Created (Newest)'),
             ('-created_at', 'Date Created (Oldest)'),
             ('title', 'Title (A-Z)'),
@@ -168,7 +169,60 @@ class BulkDocumentActionForm(forms.Form):
         super().__init__(*args, **kwargs)
         
         if user:
-            self.fields['selected_documents'].queryset = Document.objects.filter(
+            self.fields['selected_documents'].queryset = Document.objects.without_text().filter(
                 uploaded_by=user
             ).order_by('-created_at')
 
+
+class QuizBatchGenerationForm(forms.Form):
+    """Form for generating quizzes for several documents and difficulty levels at once"""
+    
+    documents = forms.ModelMultipleChoiceField(
+        queryset=Document.objects.none(),
+        required=True,
+        error_messages={
+            'invalid_choice': "Document %(value)s is not available or has not been processed yet.",
+        }
+    )
+    
+    difficulties = forms.MultipleChoiceField(
+        choices=Quiz.DIFFICULTY_LEVELS,
+        required=True
+    )
+    
+    num_questions = forms.IntegerField(min_value=5, max_value=50, initial=10)
+    
+    time_limit_minutes = forms.IntegerField(min_value=5, max_value=120, initial=30)
+    
+    variants = forms.IntegerField(
+        min_value=1,
+        max_value=10,
+        initial=1,
+        required=False,
+        help_text="Number of quizzes per document and difficulty"
+    )
+    
+    seed = forms.IntegerField(
+        min_value=0,
+        required=False,
+        help_text="Base seed: the same seed always gives the same questions"
+    )
+    
+    def get_seeds(self):
+        """One seed per variant (None for randomly drawn quizzes)"""
+        variants = self.cleaned_data.get('variants') or 1
+        seed = self.cleaned_data.get('seed')
+        if seed is None:
+            return [None] * variants
+        return [seed + i for i in range(variants)]
+    
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        
+        if user:
+            # Quizzes are generated from the extracted text
+            self.fields['documents'].queryset = Document.objects.without_text().filter(
+                uploaded_by=user, is_processed=True
+            )
+
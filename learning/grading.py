@@ -0,0 +1,128 @@
+"""
+Regrading of stored answers after an answer key changed.
+
+Answers are streamed quiz by quiz with a server-side cursor and graded in
+fixed-size batches (see answer_checker.grade_batch), so memory stays bounded
+whatever the number of UserAnswer rows. Attempt scores and performance
+metrics are then recomputed with set-based UPDATE statements.
+"""
+import logging
+from itertools import islice
+from typing import Iterable, NamedTuple
+
+from django.conf import settings
+from django.db.models import Avg, Case, F, FloatField, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .answer_checker import answer_key_cache, grade_batch
+from .models import PerformanceMetrics, Quiz, QuizAttempt, UserAnswer
+
+logger = logging.getLogger(__name__)
+
+
+class RegradeResult(NamedTuple):
+    quizzes: int
+    answers: int
+    changed: int
+    attempts: int
+    metrics: int
+
+
+def regrade(quiz_ids: Iterable[int] = None, question_ids: Iterable[int] = None,
+            document_ids: Iterable[int] = None, chunk_size: int = None) -> RegradeResult:
+    """Regrade the answers to some quizzes, questions or documents' quizzes and refresh the scores built on them"""
+    chunk_size = chunk_size or getattr(settings, 'REGRADE_CHUNK_SIZE', 2000)
+    question_ids = list(question_ids) if question_ids is not None else None
+
+    quizzes = Quiz.objects.all()
+    if quiz_ids is not None:
+        quizzes = quizzes.filter(pk__in=list(quiz_ids))
+    if question_ids is not None:
+        quizzes = quizzes.filter(questions__in=question_ids)
+    if document_ids is not None:
+        quizzes = quizzes.filter(document_id__in=list(document_ids))
+    quiz_ids = sorted(set(quizzes.values_list('pk', flat=True)))
+
+    # Grade against the keys as they are now, not as this process cached them
+    for quiz_id in quiz_ids:
+        answer_key_cache.invalidate_quiz(quiz_id)
+
+    answers = changed = 0
+    for quiz_id in quiz_ids:
+        rows = UserAnswer.objects.filter(question__quiz_id=quiz_id)
+        if question_ids is not None:
+            rows = rows.filter(question_id__in=question_ids)
+        rows = (
+            rows.select_related('question')
+            .only(
+                'id', 'user_answer', 'is_correct', 'points_earned', 'question__id', 'question__quiz',
+                'question__question_type', 'question__points', 'question__correct_answer',
+                'question__key_version',
+            )
+            .order_by('pk')
+            .iterator(chunk_size=chunk_size)
+        )
+        while True:
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                break
+            answers += len(batch)
+            changed += len(grade_batch(batch))
+
+    attempts = refresh_attempt_scores(quiz_ids)
+    metrics = refresh_performance_metrics(quiz_ids)
+    logger.info(
+        f"Regraded {answers} answer(s) of {len(quiz_ids)} quiz(zes): {changed} changed, "
+        f"{attempts} attempt(s) and {metrics} performance metric(s) refreshed"
+    )
+    return RegradeResult(len(quiz_ids), answers, changed, attempts, metrics)
+
+
+def refresh_attempt_scores(quiz_ids: Iterable[int]) -> int:
+    """Recompute earned_points and score of the completed attempts of some quizzes"""
+    attempts = QuizAttempt.objects.filter(quiz_id__in=list(quiz_ids), status='completed')
+    earned = (
+        UserAnswer.objects.filter(attempt=OuterRef('pk'))
+        .order_by()
+        .values('attempt')
+        .annotate(total=Sum('points_earned'))
+        .values('total')
+    )
+    updated = attempts.update(earned_points=Coalesce(Subquery(earned, output_field=IntegerField()), 0))
+    attempts.update(score=Case(
+        When(total_points__gt=0, then=Cast(F('earned_points'), FloatField()) * 100.0 / F('total_points')),
+        default=Value(0.0),
+        output_field=FloatField(),
+    ))
+    return updated
+
+
+def refresh_performance_metrics(quiz_ids: Iterable[int]) -> int:
+    """Recompute the average/best scores and mastery of the users of some quizzes' documents"""
+    document_ids = Quiz.objects.filter(pk__in=list(quiz_ids)).values('document_id')
+    metrics = PerformanceMetrics.objects.filter(document_id__in=document_ids)
+    scores = (
+        QuizAttempt.objects.filter(
+            user_id=OuterRef('user_id'), quiz__document_id=OuterRef('document_id'), status='completed',
+        )
+        .order_by()
+        .values('user_id')
+    )
+    updated = metrics.update(
+        average_score=Coalesce(
+            Subquery(scores.annotate(value=Avg('score')).values('value'), output_field=FloatField()),
+            F('average_score'),
+        ),
+        best_score=Coalesce(
+            Subquery(scores.annotate(value=Max('score')).values('value'), output_field=FloatField()),
+            F('best_score'),
+        ),
+    )
+    # Same thresholds as views.update_performance_metrics
+    metrics.update(mastery_level=Case(
+        When(average_score__gte=90, then=Value('expert')),
+        When(average_score__gte=75, then=Value('advanced')),
+        When(average_score__gte=60, then=Value('intermediate')),
+        default=Value('beginner'),
+    ))
+    return updated
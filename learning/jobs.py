@@ -0,0 +1,417 @@
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ProcessingJob
+
+
+logger = logging.getLogger(__name__)
+
+# Registry of job handlers: job_type -> callable(job)
+JOB_HANDLERS = {}
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help: the job fails right away"""
+
+
+def job_handler(job_type):
+    """Register a function as the handler for a job type"""
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+def get_worker_id():
+    """Identify the current worker process in job locks"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_job(job_type, document=None, payload=None, priority=ProcessingJob.PRIORITY_NORMAL, max_attempts=None):
+    """Create a pending job for the worker command to pick up"""
+    if max_attempts is None:
+        max_attempts = getattr(settings, 'JOB_MAX_ATTEMPTS', 3)
+
+    return ProcessingJob.objects.create(
+        job_type=job_type,
+        document=document,
+        payload=payload or {},
+        priority=priority,
+        max_attempts=max_attempts,
+    )
+
+
+def enqueue_document_extraction(document, priority=ProcessingJob.PRIORITY_NORMAL):
+    """Queue text extraction for a document, reusing an already pending job"""
+    existing = ProcessingJob.objects.filter(
+        job_type='extract_text',
+        document=document,
+        status='pending',
+    ).first()
+    if existing:
+        if priority > existing.priority:
+            existing.priority = priority
+            existing.save(update_fields=['priority'])
+        return existing
+
+    return enqueue_job('extract_text', document=document, priority=priority)
+
+
+def enqueue_extraction_batch(documents, priority=ProcessingJob.PRIORITY_LOW):
+    """Queue one extraction job per document under a shared batch id"""
+    batch_id = uuid.uuid4()
+    max_attempts = getattr(settings, 'JOB_MAX_ATTEMPTS', 3)
+    ProcessingJob.objects.bulk_create([
+        ProcessingJob(
+            job_type='extract_text',
+            document=document,
+            batch_id=batch_id,
+            priority=priority,
+            max_attempts=max_attempts,
+        )
+        for document in documents
+    ])
+    return batch_id
+
+
+def enqueue_quiz_generation_batch(documents, difficulties, num_questions, time_limit, user,
+                                  seeds=None, priority=ProcessingJob.PRIORITY_NORMAL):
+    """Queue quiz generation for every document x difficulty x seed under a shared batch id
+
+    One job per document, so each worker loads a document's sentence index
+    once and generates all of its quizzes from it. Seeded quizzes are
+    reproducible and reuse cached variants.
+    """
+    seeds = list(seeds) if seeds else [None]
+    batch_id = uuid.uuid4()
+    max_attempts = getattr(settings, 'JOB_MAX_ATTEMPTS', 3)
+    ProcessingJob.objects.bulk_create([
+        ProcessingJob(
+            job_type='generate_quiz_batch',
+            document=document,
+            batch_id=batch_id,
+            priority=priority,
+            max_attempts=max_attempts,
+            payload={
+                'user_id': user.pk,
+                'difficulties': list(difficulties),
+                'num_questions': num_questions,
+                'time_limit': time_limit,
+                'seeds': seeds,
+            },
+        )
+        for document in documents
+    ])
+    return batch_id
+
+
+def enqueue_api_quiz_generation(quiz_api_result, priority=ProcessingJob.PRIORITY_HIGH):
+    """Queue the API call that fills in a pending QuizAPIResult"""
+    return enqueue_job(
+        'generate_api_quiz',
+        document=quiz_api_result.document,
+        payload={'quiz_api_result_id': quiz_api_result.pk},
+        priority=priority,
+    )
+
+
+def enqueue_regrade(quiz_ids=None, question_ids=None, document_ids=None, priority=ProcessingJob.PRIORITY_LOW):
+    """Queue the regrading of the answers to some quizzes, questions or documents' quizzes"""
+    return enqueue_job(
+        'regrade',
+        payload={
+            'quiz_ids': list(quiz_ids) if quiz_ids is not None else None,
+            'question_ids': list(question_ids) if question_ids is not None else None,
+            'document_ids': list(document_ids) if document_ids is not None else None,
+        },
+        priority=priority,
+    )
+
+
+def get_batch_status(batch_id, user=None):
+    """Summarize the progress of a batch, with the status of each document"""
+    jobs = ProcessingJob.objects.filter(batch_id=batch_id)
+    if user is not None:
+        jobs = jobs.filter(document__uploaded_by=user)
+
+    items = []
+    counts = {status: 0 for status, _ in ProcessingJob.STATUS_CHOICES}
+    rows = jobs.order_by('pk').values(
+        'pk', 'document_id', 'document__title', 'status', 'attempts', 'last_error', 'payload'
+    )
+    for row in rows:
+        counts[row['status']] += 1
+        items.append({
+            'job_id': row['pk'],
+            'document_id': row['document_id'],
+            'document_title': row['document__title'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'last_error': row['last_error'],
+            'quiz_ids': row['payload'].get('quiz_ids', []),
+        })
+
+    total = len(items)
+    finished = counts['completed'] + counts['failed']
+    return {
+        'batch_id': str(batch_id),
+        'total': total,
+        'counts': counts,
+        'progress': round(finished / total * 100, 1) if total else 100.0,
+        'is_finished': finished == total,
+        'documents': items,
+    }
+
+
+def claim_jobs(limit, worker_id=None):
+    """Atomically lock up to `limit` runnable jobs for this worker"""
+    worker_id = worker_id or get_worker_id()
+    now = timezone.now()
+
+    with transaction.atomic():
+        jobs = list(
+            ProcessingJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', run_after__lte=now)
+            .order_by('-priority', 'created_at')[:limit]
+        )
+        if not jobs:
+            return []
+
+        ProcessingJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status='running',
+            locked_by=worker_id,
+            locked_at=now,
+            started_at=now,
+        )
+
+    return [job.pk for job in jobs]
+
+
+def heartbeat_jobs(job_ids, worker_id=None):
+    """Refresh the locks of jobs this worker is still running, so they are not taken for stale"""
+    return ProcessingJob.objects.filter(
+        pk__in=list(job_ids), status='running', locked_by=worker_id or get_worker_id(),
+    ).update(locked_at=timezone.now())
+
+
+def requeue_stale_jobs(timeout_seconds=None):
+    """Put back jobs whose worker died while running them (no heartbeat for `timeout_seconds`)
+
+    Counted as an attempt, like a crash: a job that keeps losing its worker
+    fails once it has used its attempts.
+    """
+    if timeout_seconds is None:
+        timeout_seconds = getattr(settings, 'JOB_STALE_TIMEOUT_SECONDS', 5 * 60)
+
+    cutoff = timezone.now() - timedelta(seconds=timeout_seconds)
+    return _release(
+        ProcessingJob.objects.filter(status='running', locked_at__lt=cutoff),
+        "Job worker stopped responding while running the job",
+    )
+
+
+def release_jobs(job_ids, error):
+    """Put back running jobs whose worker process crashed, counting the crash as an attempt
+
+    A job that keeps crashing its worker fails once it has used its attempts.
+    """
+    return _release(ProcessingJob.objects.filter(pk__in=list(job_ids), status='running'), error)
+
+
+def _release(jobs, error):
+    now = timezone.now()
+    released = jobs.filter(attempts__lt=F('max_attempts') - 1).update(
+        status='pending',
+        attempts=F('attempts') + 1,
+        last_error=error,
+        locked_by='',
+        locked_at=None,
+        run_after=now,
+    )
+    jobs.update(
+        status='failed',
+        attempts=F('attempts') + 1,
+        last_error=error,
+        locked_by='',
+        locked_at=None,
+        finished_at=now,
+    )
+    return released
+
+
+def _retry_delay(attempts):
+    """Exponential backoff with jitter, in seconds"""
+    base = getattr(settings, 'JOB_RETRY_BASE_SECONDS', 30)
+    delay = base * (2 ** max(0, attempts - 1))
+    return delay + random.uniform(0, base)
+
+
+def run_job(job_id):
+    """Execute a claimed job and record its outcome"""
+    job = (
+        ProcessingJob.objects.select_related('document')
+        .defer('document__extracted_text', 'document__search_vector')
+        .get(pk=job_id)
+    )
+    handler = JOB_HANDLERS.get(job.job_type)
+
+    job.attempts += 1
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for job type '{job.job_type}'")
+        handler(job)
+    except Exception as e:
+        job.last_error = str(e)
+        job.locked_by = ''
+        job.locked_at = None
+        if job.attempts < job.max_attempts and not isinstance(e, PermanentJobError):
+            job.status = 'pending'
+            job.run_after = timezone.now() + timedelta(seconds=_retry_delay(job.attempts))
+            logger.warning(f"Job {job.pk} failed (attempt {job.attempts}/{job.max_attempts}), retrying: {e}")
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            logger.error(f"Job {job.pk} failed permanently: {e}")
+        job.save()
+        return job.status
+
+    job.status = 'completed'
+    job.last_error = ''
+    job.finished_at = timezone.now()
+    job.save()
+    return job.status
+
+
+def get_document_job_status(document):
+    """Return the state of the latest extraction job for a document"""
+    job = document.processing_jobs.filter(job_type='extract_text').order_by('-created_at').first()
+    if job is None:
+        return None
+
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'attempts': job.attempts,
+        'max_attempts': job.max_attempts,
+        'last_error': job.last_error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+@job_handler('extract_text')
+def _handle_extract_text(job):
+    from .utils import extract_text_from_document
+
+    if job.document is None:
+        raise ValueError("Extraction job has no document")
+    extract_text_from_document(job.document)
+
+
+@job_handler('generate_quiz_batch')
+def _handle_generate_quiz_batch(job):
+    from django.contrib.auth.models import User
+    from .quiz_generator import QuizGenerator
+
+    if job.document is None:
+        raise ValueError("Quiz generation job has no document")
+    if not job.document.is_processed:
+        # Its sentence index would be empty: the quizzes would have no questions
+        raise PermanentJobError(
+            f"Document '{job.document.title}' has not been processed yet; "
+            f"extract its text before generating quizzes"
+        )
+
+    payload = job.payload
+    user = User.objects.get(pk=payload['user_id'])
+    generator = QuizGenerator(job.document)
+    specs = [
+        {
+            'title': f"Quiz: {job.document.title} ({difficulty})",
+            'difficulty': difficulty,
+            'num_questions': payload['num_questions'],
+            'time_limit': payload['time_limit'],
+            'seed': seed,
+        }
+        for difficulty in payload['difficulties']
+        for seed in payload.get('seeds') or [None]
+    ]
+    quizzes = generator.generate_quizzes(specs, created_by=user)
+    job.payload = {**payload, 'quiz_ids': [quiz.pk for quiz in quizzes]}
+
+
+@job_handler('generate_api_quiz')
+def _handle_generate_api_quiz(job):
+    from .models import QuizAPIResult
+    from .quiz_api import QuizAPIConfigError, generate_quiz_data_with_fallback, question_key
+    from .utils import get_document_text
+
+    result = QuizAPIResult.objects.select_related('document').get(pk=job.payload['quiz_api_result_id'])
+    result.status = 'running'
+    result.save(update_fields=['status'])
+
+    # Questions are saved in arrival order as soon as they are received, so
+    # the quiz can start early; questions saved by an earlier try are kept
+    # since students may already be answering them
+    questions = list(result.get_questions())
+    seen = {question_key(question) for question in questions}
+
+    def add_question(question):
+        key = question_key(question)
+        if key in seen:
+            return False
+        seen.add(key)
+        questions.append(question)
+        return True
+
+    def save_question(kind, item):
+        if add_question(item):
+            QuizAPIResult.objects.filter(pk=result.pk).update(api_response={'questions': questions})
+
+    try:
+        doc_text = get_document_text(result.document)
+        quiz_data, warning = generate_quiz_data_with_fallback(
+            doc_text, result.difficulty, result.num_questions, on_item=save_question,
+            received_before=len(questions),
+        )
+    except QuizAPIConfigError as e:
+        # Retrying will not help until the key is configured
+        result.status = 'failed'
+        result.error_message = str(e)
+        result.save(update_fields=['status', 'error_message'])
+        return
+    except Exception as e:
+        # Let the job be retried; the result only fails with the last attempt
+        result.status = 'failed' if job.attempts >= job.max_attempts else 'pending'
+        result.error_message = str(e)
+        result.save(update_fields=['status', 'error_message'])
+        raise
+
+    for question in quiz_data.get('qcm', []) + quiz_data.get('vrai_faux', []):
+        add_question(question)
+    result.api_response = {'questions': questions}
+    result.error_message = warning
+    result.status = 'completed'
+    result.save(update_fields=['api_response', 'error_message', 'status'])
+
+
+@job_handler('regrade')
+def _handle_regrade(job):
+    from .grading import regrade
+
+    payload = job.payload
+    result = regrade(
+        quiz_ids=payload.get('quiz_ids'),
+        question_ids=payload.get('question_ids'),
+        document_ids=payload.get('document_ids'),
+    )
+    job.payload = {**payload, 'result': result._asdict()}
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from learning.models import Document
+from learning.search import reindex_documents
+
+
+class Command(BaseCommand):
+    help = "Compute the full-text search vectors of documents, e.g. those stored before search indexing existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--document', type=int, action='append', dest='documents', help="Document id (repeatable)")
+        parser.add_argument('--missing', action='store_true', help="Only documents without a search vector")
+        parser.add_argument('--batch-size', type=int, default=500, help="Documents updated per statement")
+
+    def handle(self, *args, **options):
+        documents = Document.objects.all()
+        if options['documents']:
+            documents = documents.filter(pk__in=options['documents'])
+        if options['missing']:
+            documents = documents.filter(search_vector__isnull=True)
+
+        indexed = reindex_documents(documents, batch_size=max(1, options['batch_size']))
+        self.stdout.write(f"Indexed {indexed} document(s) for search")
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from learning.grading import regrade
+
+
+class Command(BaseCommand):
+    help = "Regrade stored answers after an answer key fix and refresh attempt scores and performance metrics"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, action='append', dest='quizzes', help="Quiz id (repeatable)")
+        parser.add_argument('--question', type=int, action='append', dest='questions', help="Question id (repeatable)")
+        parser.add_argument('--document', type=int, action='append', dest='documents', help="Document id (repeatable)")
+        parser.add_argument('--all', action='store_true', help="Regrade the answers to every quiz")
+        parser.add_argument(
+            '--chunk-size', type=int,
+            default=getattr(settings, 'REGRADE_CHUNK_SIZE', 2000),
+            help="Answers fetched and graded per batch",
+        )
+
+    def handle(self, *args, **options):
+        if not (options['quizzes'] or options['questions'] or options['documents'] or options['all']):
+            raise CommandError("Pass --quiz, --question, --document or --all")
+
+        result = regrade(
+            quiz_ids=options['quizzes'],
+            question_ids=options['questions'],
+            document_ids=options['documents'],
+            chunk_size=max(1, options['chunk_size']),
+        )
+        self.stdout.write(
+            f"Regraded {result.answers} answer(s) of {result.quizzes} quiz(zes): {result.changed} changed, "
+            f"{result.attempts} attempt(s) and {result.metrics} performance metric(s) refreshed"
+        )
@@ -0,0 +1,152 @@
+import multiprocessing
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from learning.jobs import (
+    claim_jobs, heartbeat_jobs, release_jobs, requeue_stale_jobs, run_job, get_worker_id
+)
+
+
+class JobTimeout(Exception):
+    pass
+
+
+def _init_worker():
+    # Forked children must not share the parent's database connections
+    connections.close_all()
+
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout(f"Job exceeded its time limit of {getattr(settings, 'JOB_TIMEOUT_SECONDS', 60 * 60)} seconds")
+
+
+def _run_job_in_worker(job_id):
+    # Interrupt a hung job (e.g. a parser looping on a malformed file): run_job
+    # records the JobTimeout as a failed attempt and frees the process
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.alarm(getattr(settings, 'JOB_TIMEOUT_SECONDS', 60 * 60))
+    try:
+        return run_job(job_id)
+    finally:
+        signal.alarm(0)
+        connections.close_all()
+
+
+def _create_pool(workers):
+    # Children are forked from the set-up Django process, whatever the platform's default start method
+    return ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, mp_context=multiprocessing.get_context('fork'),
+    )
+
+
+class Command(BaseCommand):
+    help = "Process queued background jobs (document text extraction, ...) with a bounded process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=getattr(settings, 'JOB_WORKER_CONCURRENCY', 2),
+            help="Maximum number of jobs processed concurrently",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=getattr(settings, 'JOB_POLL_INTERVAL_SECONDS', 2.0),
+            help="Seconds to wait between queue polls when idle",
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Drain the currently runnable jobs and exit",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        stale_check_interval = getattr(settings, 'JOB_STALE_CHECK_INTERVAL_SECONDS', 60)
+        heartbeat_interval = getattr(settings, 'JOB_HEARTBEAT_INTERVAL_SECONDS', 30)
+        worker_id = get_worker_id()
+
+        self.requeue_stale_jobs()
+        next_stale_check = time.monotonic() + stale_check_interval
+        next_heartbeat = time.monotonic() + heartbeat_interval
+
+        self.stdout.write(f"Job worker {worker_id} started with {workers} process(es)")
+
+        # Close the parent's connection before forking the pool
+        connections.close_all()
+        pool = _create_pool(workers)
+        running = {}
+        try:
+            while True:
+                # Jobs of workers (on any host) that died while running them
+                if time.monotonic() >= next_stale_check:
+                    self.requeue_stale_jobs()
+                    next_stale_check = time.monotonic() + stale_check_interval
+
+                # Show the jobs still running here are alive
+                if time.monotonic() >= next_heartbeat:
+                    if running:
+                        heartbeat_jobs(running.values(), worker_id)
+                    next_heartbeat = time.monotonic() + heartbeat_interval
+
+                broken = False
+                for future in [f for f in running if f.done()]:
+                    job_id = running.pop(future)
+                    try:
+                        status = future.result()
+                        self.stdout.write(f"Job {job_id}: {status}")
+                    except BrokenProcessPool:
+                        running[future] = job_id
+                        broken = True
+                    except Exception as e:
+                        self.stderr.write(f"Job {job_id} crashed the worker: {e}")
+
+                job_ids = []
+                if not broken:
+                    free_slots = workers - len(running)
+                    job_ids = claim_jobs(free_slots, worker_id) if free_slots > 0 else []
+                    try:
+                        for job_id in job_ids:
+                            running[pool.submit(_run_job_in_worker, job_id)] = job_id
+                    except BrokenProcessPool:
+                        broken = True
+                        submitted = set(running.values())
+                        release_jobs([job_id for job_id in job_ids if job_id not in submitted],
+                                     "Job worker pool broken before the job started")
+
+                if broken:
+                    pool = self.recreate_pool(pool, running, workers)
+                    continue
+
+                if options['once'] and not running and not job_ids:
+                    break
+                if not job_ids:
+                    time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping job worker, waiting for running jobs...")
+        finally:
+            pool.shutdown(wait=True)
+
+        self.stdout.write("Job worker stopped")
+
+    def requeue_stale_jobs(self):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+    def recreate_pool(self, pool, running, workers):
+        """Put back the in-flight jobs of a broken pool (a child process died) and start a new pool"""
+        job_ids = list(running.values())
+        running.clear()
+        released = release_jobs(job_ids, "Job worker process died while running the job")
+        self.stderr.write(
+            f"Job worker pool broken, {released}/{len(job_ids)} in-flight job(s) put back; restarting the pool"
+        )
+        pool.shutdown(wait=False)
+        connections.close_all()
+        return _create_pool(workers)
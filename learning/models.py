@@ -1,10 +1,18 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django.conf import settings
 import json
 
 
+class DocumentQuerySet(models.QuerySet):
+    def without_text(self):
+        """Skip the (potentially huge) extracted text and search vector columns"""
+        return self.defer('extracted_text', 'search_vector')
+
+
 class Document(models.Model):
     """Model for uploaded study documents"""
     DOCUMENT_TYPES = [
@@ -17,20 +25,116 @@ class Document(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     file = models.FileField(upload_to='documents/')
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
     document_type = models.CharField(max_length=10, choices=DOCUMENT_TYPES)
     uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='documents')
     extracted_text = models.TextField(blank=True)
     word_count = models.IntegerField(default=0)
+    character_count = models.IntegerField(default=0)
+    sentence_count = models.IntegerField(default=0)
+    paragraph_count = models.IntegerField(default=0)
     is_processed = models.BooleanField(default=False)
     processing_error = models.TextField(blank=True)
+    search_vector = SearchVectorField(blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DocumentQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
+    def iter_text(self):
+        """Stream the extracted text chunk by chunk without loading it all"""
+        chunks = self.chunks.order_by('index').values_list('text', flat=True)
+        found = False
+        for text in chunks.iterator(chunk_size=50):
+            found = True
+            yield text
+        if not found and self.extracted_text:
+            # Documents processed before chunked storage existed
+            yield self.extracted_text
+
+    def get_full_text(self):
+        """Rebuild the full extracted text from its chunks"""
+        return '\n'.join(self.iter_text())
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='learning_document_search_idx'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='learning_document_title_trgm'),
+            GinIndex(fields=['description'], opclasses=['gin_trgm_ops'], name='learning_document_desc_trgm'),
+        ]
+
+
+class DocumentChunk(models.Model):
+    """Ordered page/section of a document's extracted text"""
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    start_offset = models.IntegerField()
+    end_offset = models.IntegerField()
+    word_count = models.IntegerField(default=0)
+    text = models.TextField()
+
+    def __str__(self):
+        return f"{self.document.title} - chunk {self.index}"
+
+    class Meta:
+        ordering = ['document', 'index']
+        unique_together = ['document', 'index']
+
+
+class DocumentTextIndex(models.Model):
+    """Sentences usable for question generation, with their key terms, built at extraction time"""
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, related_name='text_index')
+    version = models.IntegerField(default=1)
+    # [{"text": ..., "terms": [...], "position": n}, ...]: a bounded sample of the informative
+    # sentences, or of the sentences of 10+ words if there are none (see SentenceIndexBuilder)
+    sentences = models.JSONField(default=list)
+    # Indexes into `sentences` of the informative ones (20-50 words, proper nouns, ...)
+    informative = models.JSONField(default=list)
+    # Term statistics used to pick distractors, see distractors.TermIndexBuilder:
+    # {"terms": [...], "frequencies": [...], "categories": "NPW...", "cooccurrence": [[term ids], ...]}
+    terms = models.JSONField(default=dict)
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.document.title} ({len(self.sentences)} sentences)"
+
+
+class ExtractionCache(models.Model):
+    """Extracted text shared by every document with the same file content"""
+    content_hash = models.CharField(max_length=64)
+    extractor_version = models.IntegerField(default=1)
+    extracted_text = models.TextField(blank=True)
+    word_count = models.IntegerField(default=0)
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} ({self.word_count} words)"
+
+    class Meta:
+        unique_together = ['content_hash', 'extractor_version']
+
+
+class QuizVariant(models.Model):
+    """Question set generated with a fixed seed, shared by documents with the same content"""
+    variant_id = models.CharField(max_length=64, unique=True)
+    content_hash = models.CharField(max_length=64, db_index=True)
+    difficulty = models.CharField(max_length=10)
+    num_questions = models.IntegerField()
+    seed = models.BigIntegerField()
+    # Question dicts as produced by QuizGenerator._generate_questions
+    questions = models.JSONField(default=list)
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.variant_id} ({self.difficulty}, {self.num_questions} questions, seed {self.seed})"
 
 
 class Quiz(models.Model):
@@ -49,6 +153,9 @@ class Quiz(models.Model):
     time_limit_minutes = models.IntegerField(default=30)
     is_active = models.BooleanField(default=True)
     total_questions = models.IntegerField(default=0)
+    # Set for quizzes generated from a fixed seed, see QuizVariant
+    seed = models.BigIntegerField(blank=True, null=True)
+    variant_id = models.CharField(max_length=64, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -57,6 +164,10 @@ class Quiz(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='learning_quiz_title_trgm'),
+            GinIndex(fields=['description'], opclasses=['gin_trgm_ops'], name='learning_quiz_desc_trgm'),
+        ]
 
 
 class Question(models.Model):
@@ -75,13 +186,25 @@ class Question(models.Model):
     explanation = models.TextField(blank=True)
     points = models.IntegerField(default=1)
     order = models.IntegerField(default=0)
+    # Bumped whenever the question or one of its options is saved or deleted (see signals.py)
+    key_version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Q{self.order}: {self.question_text[:50]}..."
 
+    def save(self, *args, **kwargs):
+        # key_version is only ever incremented by the database (see signals.py):
+        # left deferred, an update does not write back this instance's copy
+        if not self._state.adding:
+            self.__dict__.pop('key_version', None)
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['order']
+        indexes = [
+            GinIndex(fields=['question_text'], opclasses=['gin_trgm_ops'], name='learning_question_text_trgm'),
+        ]
 
 
 class QuestionOption(models.Model):
@@ -207,10 +330,21 @@ class StudyGoal(models.Model):
 
 
 class QuizAPIResult(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Generating'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
     document = models.ForeignKey('Document', on_delete=models.CASCADE, related_name='api_quizzes')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='api_quizzes')
     title = models.CharField(max_length=255, blank=True)
-    api_response = models.JSONField()
+    # Filled in by the 'generate_api_quiz' background job
+    api_response = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='completed')
+    # Why generation failed, or why test data was used instead of the API response
+    error_message = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     time_limit_minutes = models.PositiveIntegerField(default=30)
     difficulty = models.CharField(max_length=50, default='easy')
@@ -219,6 +353,36 @@ class QuizAPIResult(models.Model):
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
+    @property
+    def is_ready(self):
+        return self.status == 'completed'
+
+    def get_questions(self):
+        """Questions in the order served by quiz_api_attempt
+        
+        Generated results keep them in arrival order under "questions", so
+        indices already served never move; older results list the QCM then
+        the true/false questions.
+        """
+        data = self.api_response or {}
+        if 'questions' in data:
+            return data['questions']
+        return data.get('qcm', []) + data.get('vrai_faux', [])
+
+
+class LLMResponseCache(models.Model):
+    """Parsed quiz generation API response, keyed by a hash of the model and prompt"""
+    prompt_hash = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=100)
+    response = models.JSONField()
+    hit_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.prompt_hash[:12]} ({self.model}, {self.hit_count} hits)"
+
 
 class QuizAPIAttempt(models.Model):
     """Model for user attempts on API-generated quizzes"""
@@ -249,4 +413,56 @@ class QuizAPIAttempt(models.Model):
         return 0
 
     class Meta:
-        ordering = ['-started_at']
\ No newline at end of file
+        ordering = ['-started_at']
+
+
+class ProcessingJob(models.Model):
+    """Durable background job processed by the `run_jobs` worker command"""
+    JOB_TYPES = [
+        ('extract_text', 'Extract Document Text'),
+        ('generate_quiz_batch', 'Generate Quizzes'),
+        ('generate_api_quiz', 'Generate Quiz with the API'),
+        ('regrade', 'Regrade Answers'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    PRIORITY_LOW = 0
+    PRIORITY_NORMAL = 5
+    PRIORITY_HIGH = 10
+
+    job_type = models.CharField(max_length=30, choices=JOB_TYPES)
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, related_name='processing_jobs', blank=True, null=True
+    )
+    payload = models.JSONField(default=dict, blank=True)
+    batch_id = models.UUIDField(blank=True, null=True, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    priority = models.IntegerField(default=PRIORITY_NORMAL)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} #{self.pk} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+
+    class Meta:
+        ordering = ['-priority', 'created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after', '-priority'], name='learning_job_queue_idx'),
+        ]
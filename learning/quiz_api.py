@@ -0,0 +1,714 @@
+"""
+Client for the external quiz generation API (RapidAPI chat endpoint).
+
+Parsed responses are cached in the database by prompt hash, with a TTL
+and a maximum number of entries, and concurrent identical requests are
+coalesced so that only one of them calls the API. Long documents are
+split into sections that are sent in parallel, and the questions
+generated for each section are merged.
+
+Requests go through a shared keep-alive session, with bounded retries
+and a circuit breaker that makes callers fall back to test data at once
+while the provider is failing. Completions can be streamed, with each
+question handed to the caller as soon as it has been received.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import lru_cache
+
+import environ
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import LLMResponseCache
+
+
+logger = logging.getLogger(__name__)
+
+env = environ.Env()
+environ.Env.read_env()
+
+# In-process locks used for coalescing when the database has no advisory locks
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+# HTTP status codes worth retrying
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class QuizAPIConfigError(Exception):
+    """The API key is missing from the environment and config.py"""
+
+
+class QuizAPIUnavailable(Exception):
+    """The circuit breaker is open: the provider failed repeatedly, calls are not attempted"""
+
+
+@lru_cache(maxsize=1)
+def get_api_config():
+    """API url, host and key from the environment, falling back to config.py (read once per process)"""
+    try:
+        api_url = env('RAPIDAPI_URL', default='https://chatgpt-42.p.rapidapi.com/chat')
+        api_host = env('RAPIDAPI_HOST', default='chatgpt-42.p.rapidapi.com')
+        api_key = env('RAPIDAPI_KEY')
+    except Exception:
+        # Fallback vers la configuration temporaire
+        import config
+        api_url = config.RAPIDAPI_URL
+        api_host = config.RAPIDAPI_HOST
+        api_key = config.RAPIDAPI_KEY
+
+    if not api_key or api_key == "your_api_key_here":
+        raise QuizAPIConfigError(
+            'Clé API non configurée. Veuillez configurer RAPIDAPI_KEY dans votre fichier .env ou config.py'
+        )
+
+    return {'url': api_url, 'host': api_host, 'key': api_key}
+
+
+def get_api_model():
+    return getattr(settings, 'QUIZ_API_MODEL', 'gpt-4o-mini')
+
+
+def build_quiz_prompt(doc_text, difficulty, num_questions):
+    """Prompt asking for `num_questions` QCM and true/false questions as JSON"""
+    return (
+        "Génère un QCM et des questions vrai/faux à partir du texte suivant :\n\n"
+        f"<<CONTENU_DU_FICHIER_ICI>>\n\n"
+        "Paramètres :\n"
+        f"- difficulté : {difficulty}\n"
+        f"- nombre total de questions : {num_questions} (50% QCM et 50% vrai/faux)\n\n"
+        "Format de réponse attendu : un objet JSON contenant deux clés :\n"
+        "1. \"qcm\" : tableau de 3 questions à choix multiples. Chaque question doit avoir la structure :\n"
+        "{\n  \"q\": \"texte de la question\",\n  \"a\": \"option A\",\n  \"b\": \"option B\",\n  \"c\": \"option C\",\n  \"R\": \"a\" (ou \"b\" ou \"c\") correspondant à la bonne réponse\n}\n\n"
+        "2. \"vrai_faux\" : tableau de 3 affirmations à évaluer comme vraies ou fausses. Chaque élément doit avoir la structure :\n"
+        "{\n  \"q\": \"affirmation\",\n  \"R\": true ou false\n}\n\n"
+        "IMPORTANT : la réponse doit être strictement dans ce format JSON, sans aucune explication, sans texte en dehors du JSON. Aucun retour à la ligne inutile.\n\n"
+        f"CONTENU DU FICHIER : {doc_text}\n"
+        f"NOMBRE DE QUESTIONS : {num_questions}\n"
+        f"DIFFICULTE : {difficulty}"
+    )
+
+
+def get_prompt_hash(prompt, model):
+    return hashlib.sha256(f"{model}\n{prompt}".encode()).hexdigest()
+
+
+# HTTP client ---------------------------------------------------------------------
+
+class CircuitBreaker:
+    """Stop calling a failing service for a while
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls are refused for `reset_timeout` seconds. Then one trial call is
+    let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow_request(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+breaker = CircuitBreaker(
+    failure_threshold=getattr(settings, 'QUIZ_API_BREAKER_THRESHOLD', 5),
+    reset_timeout=getattr(settings, 'QUIZ_API_BREAKER_RESET_SECONDS', 60),
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide keep-alive session, so connections (and TLS handshakes) are reused"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = getattr(settings, 'QUIZ_API_CONCURRENCY', 4) * 2
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def _retry_delay(attempt):
+    """Exponential backoff with full jitter, in seconds"""
+    base = getattr(settings, 'QUIZ_API_RETRY_BASE_SECONDS', 1)
+    return random.uniform(0, base * (2 ** attempt))
+
+
+def post_with_retries(url, **kwargs):
+    """POST through the shared session, retrying connection errors, timeouts and 429/5xx
+
+    Failures that exhaust the retries count against the circuit breaker.
+    Raises QuizAPIUnavailable without sending anything while it is open.
+    """
+    if not breaker.allow_request():
+        raise QuizAPIUnavailable("Le service de génération est temporairement indisponible")
+
+    max_retries = getattr(settings, 'QUIZ_API_MAX_RETRIES', 2)
+    session = get_session()
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.post(url, **kwargs)
+            if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+                logger.warning(f"API returned {response.status_code}, retrying")
+                response.close()
+            else:
+                response.raise_for_status()
+                breaker.record_success()
+                return response
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= max_retries:
+                breaker.record_failure()
+                raise
+            logger.warning(f"API request failed ({e}), retrying")
+        except requests.exceptions.HTTPError:
+            # Out of retries on 429/5xx, or a client error that retrying will not fix
+            if response.status_code in RETRY_STATUS_CODES:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        except requests.exceptions.RequestException:
+            breaker.record_failure()
+            raise
+        time.sleep(_retry_delay(attempt))
+
+
+class QuizStreamParser:
+    """Pick complete questions out of the quiz JSON while it is being received
+
+    The text is fed as it arrives; each object of the top-level "qcm" and
+    "vrai_faux" arrays is returned as (key, item) once its closing brace
+    has been seen. Anything before the first '{' (e.g. a ```json fence)
+    is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.length = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_key = None
+        self.array_key = None
+        self.item_start = None
+
+    def feed(self, text):
+        items = []
+        base = self.length
+        self.buffer.append(text)
+        self.length += len(text)
+        joined = None
+
+        for offset, char in enumerate(text):
+            position = base + offset
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        joined = joined or ''.join(self.buffer)
+                        self.last_key = joined[self.string_start + 1:position]
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = position
+            elif char in '{[':
+                if self.depth == 0 and char == '[':
+                    continue
+                self.depth += 1
+                if self.depth == 2 and char == '[':
+                    self.array_key = self.last_key
+                elif self.depth == 3 and char == '{' and self.array_key:
+                    self.item_start = position
+            elif char in '}]' and self.depth:
+                if self.depth == 3 and char == '}' and self.item_start is not None:
+                    joined = joined or ''.join(self.buffer)
+                    try:
+                        items.append((self.array_key, json.loads(joined[self.item_start:position + 1])))
+                    except json.JSONDecodeError:
+                        pass  # left for the final json.loads to report
+                    self.item_start = None
+                self.depth -= 1
+                if self.depth == 1:
+                    self.array_key = None
+            if joined is not None and len(self.buffer) > 1:
+                self.buffer = [joined]
+
+        return items
+
+
+CODE_FENCE_RE = re.compile(r'^```(?:json)?\s*(.*?)\s*```$', re.S)
+
+
+def parse_quiz_content(content):
+    """Return (quiz_data, complete) for a completion text
+
+    A surrounding ```json fence is dropped. When the JSON is still invalid
+    (e.g. truncated), the complete questions found in it are returned
+    with complete=False; JSONDecodeError is raised if there are none.
+    """
+    text = content.strip()
+    match = CODE_FENCE_RE.match(text)
+    if match:
+        text = match.group(1)
+    try:
+        return json.loads(text), True
+    except json.JSONDecodeError:
+        items = QuizStreamParser().feed(text)
+        if not items:
+            raise
+    quiz_data = {'qcm': [], 'vrai_faux': []}
+    for key, item in items:
+        quiz_data.setdefault(key, []).append(item)
+    return quiz_data, False
+
+
+def iter_stream_content(response):
+    """Yield the text deltas of a streamed (server-sent events) chat completion"""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith('data:'):
+            continue
+        payload = line[len('data:'):].strip()
+        if payload == '[DONE]':
+            break
+        event = json.loads(payload)
+        for choice in event.get('choices') or []:
+            delta = choice.get('delta') or choice.get('message') or {}
+            if delta.get('content'):
+                yield delta['content']
+
+
+def request_completion(prompt, config, model, on_item=None):
+    """Send the prompt to the chat endpoint and return the completion text
+
+    With `on_item`, the completion is streamed when QUIZ_API_STREAM is on
+    and on_item(key, question) is called for each question as soon as it
+    is complete. Providers answering with plain JSON are handled too.
+    """
+    stream = on_item is not None and getattr(settings, 'QUIZ_API_STREAM', True)
+    headers = {
+        'Content-Type': 'application/json',
+        'x-rapidapi-host': config['host'],
+        'x-rapidapi-key': config['key'],
+    }
+    data = {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ]
+    }
+    if stream:
+        data["stream"] = True
+    timeout = getattr(settings, 'QUIZ_API_TIMEOUT_SECONDS', 60)
+
+    logger.info(f"Envoi de la requête à l'API: {config['url']}")
+    response = post_with_retries(config['url'], headers=headers, json=data, timeout=timeout, stream=stream)
+
+    if stream and 'text/event-stream' in response.headers.get('Content-Type', ''):
+        parser = QuizStreamParser()
+        parts = []
+        with response:
+            for delta in iter_stream_content(response):
+                parts.append(delta)
+                for key, item in parser.feed(delta):
+                    on_item(key, item)
+        content = ''.join(parts)
+    else:
+        result = response.json()
+
+        if 'choices' not in result or not result['choices']:
+            raise ValueError("Réponse API invalide: pas de 'choices' dans la réponse")
+
+        content = result['choices'][0]['message']['content']
+        if on_item is not None and content:
+            for key, item in QuizStreamParser().feed(content):
+                on_item(key, item)
+
+    if not content or content.strip() == '':
+        raise ValueError("Réponse API vide")
+    return content
+
+
+# Response cache ------------------------------------------------------------------
+
+def get_cached_response(prompt_hash):
+    """Return the cached parsed response for a prompt hash, or None"""
+    entry = (
+        LLMResponseCache.objects
+        .filter(prompt_hash=prompt_hash, expires_at__gt=timezone.now())
+        .only('pk', 'response')
+        .first()
+    )
+    if entry is None:
+        return None
+
+    LLMResponseCache.objects.filter(pk=entry.pk).update(
+        hit_count=F('hit_count') + 1,
+        last_used_at=timezone.now(),
+    )
+    return entry.response
+
+
+def store_response(prompt_hash, model, response):
+    ttl = getattr(settings, 'QUIZ_API_CACHE_TTL_SECONDS', 7 * 24 * 3600)
+    LLMResponseCache.objects.update_or_create(
+        prompt_hash=prompt_hash,
+        defaults={
+            'model': model,
+            'response': response,
+            'hit_count': 0,
+            'expires_at': timezone.now() + timedelta(seconds=ttl),
+        },
+    )
+    evict_cached_responses()
+
+
+def evict_cached_responses(max_entries=None):
+    """Drop expired entries, then the least recently used ones beyond `max_entries`"""
+    if max_entries is None:
+        max_entries = getattr(settings, 'QUIZ_API_CACHE_MAX_ENTRIES', 1000)
+
+    deleted, _ = LLMResponseCache.objects.filter(expires_at__lte=timezone.now()).delete()
+    stale = list(
+        LLMResponseCache.objects.order_by('-last_used_at').values_list('pk', flat=True)[max_entries:]
+    )
+    if stale:
+        deleted += LLMResponseCache.objects.filter(pk__in=stale).delete()[0]
+    return deleted
+
+
+@contextmanager
+def single_flight(key):
+    """Serialize work on `key` across processes (advisory lock) or threads (fallback)"""
+    if connection.vendor == 'postgresql':
+        lock_id = int.from_bytes(bytes.fromhex(key[:16]), 'big', signed=True)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [lock_id])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s)', [lock_id])
+    else:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(key, threading.Lock())
+        with lock:
+            yield
+
+
+def generate_quiz_data(doc_text, difficulty, num_questions, use_cache=True, on_item=None):
+    """Return the parsed API quiz ({"qcm": [...], "vrai_faux": [...]}) for a document text
+
+    Identical requests are served from the cache. When several arrive at
+    the same time, the first one calls the API and the others wait for
+    its result instead of sending their own request. `on_item` receives
+    the questions of an actual API call as they arrive (see
+    request_completion), not those of a cached response.
+    """
+    model = get_api_model()
+    prompt = build_quiz_prompt(doc_text, difficulty, num_questions)
+    prompt_hash = get_prompt_hash(prompt, model)
+
+    if use_cache:
+        cached = get_cached_response(prompt_hash)
+        if cached is not None:
+            return cached
+
+    with single_flight(prompt_hash):
+        # Another request may have filled the cache while we were waiting
+        if use_cache:
+            cached = get_cached_response(prompt_hash)
+            if cached is not None:
+                return cached
+
+        content = request_completion(prompt, get_api_config(), model, on_item=on_item)
+        quiz_data, complete = parse_quiz_content(content)
+        if not complete:
+            logger.warning(f"Réponse API incomplète, {len(quiz_data['qcm']) + len(quiz_data['vrai_faux'])} question(s) récupérée(s)")
+            return quiz_data
+        store_response(prompt_hash, model, quiz_data)
+
+    return quiz_data
+
+
+# Long documents (map-reduce over sections) ------------------------------------------
+
+QUESTION_KEY_RE = re.compile(r'[^\w]+')
+
+
+def get_chunk_size():
+    """Maximum section length in characters, from the token budget per prompt"""
+    tokens = getattr(settings, 'QUIZ_API_CHUNK_TOKENS', 6000)
+    chars_per_token = getattr(settings, 'QUIZ_API_CHARS_PER_TOKEN', 4)
+    return tokens * chars_per_token
+
+
+def split_text_for_prompts(text, max_chars):
+    """Split a text into sections of at most `max_chars`, at paragraph or line breaks when possible"""
+    sections = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = start + max_chars
+        if end >= length:
+            sections.append(text[start:])
+            break
+        cut = text.rfind('\n\n', start, end)
+        if cut <= start:
+            cut = text.rfind('\n', start, end)
+        if cut <= start:
+            cut = text.rfind(' ', start, end)
+        if cut <= start:
+            # No break at all: hard cut
+            sections.append(text[start:end])
+            start = end
+            continue
+        sections.append(text[start:cut])
+        start = cut + 1
+    return [section.strip() for section in sections if section.strip()]
+
+
+def select_sections(sections, count):
+    """Keep `count` sections spread evenly over the document"""
+    if count >= len(sections):
+        return sections
+    if count == 1:
+        return [sections[len(sections) // 2]]
+    step = (len(sections) - 1) / (count - 1)
+    return [sections[round(i * step)] for i in range(count)]
+
+
+def distribute_questions(num_questions, parts):
+    """Split a number of questions between `parts` sections as evenly as possible"""
+    base, extra = divmod(num_questions, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def question_key(question):
+    """Normalized question text, to spot the same question twice"""
+    return QUESTION_KEY_RE.sub(' ', str(question.get('q', '')).lower()).strip()
+
+
+def merge_quiz_data(parts, num_questions):
+    """Merge per-section quizzes, dropping duplicate questions
+
+    Questions are taken from each section in turn, so trimming to the
+    requested number keeps questions from the whole document.
+    """
+    targets = {'qcm': (num_questions + 1) // 2, 'vrai_faux': num_questions // 2}
+    merged = {}
+    for kind, target in targets.items():
+        seen = set()
+        items = []
+        queues = [list(part.get(kind) or []) for part in parts]
+        while len(items) < target and any(queues):
+            for queue in queues:
+                if not queue or len(items) >= target:
+                    continue
+                question = queue.pop(0)
+                key = question_key(question)
+                if key and key not in seen:
+                    seen.add(key)
+                    items.append(question)
+        merged[kind] = items
+    return merged
+
+
+def _generate_section(section, difficulty, num_questions):
+    try:
+        return generate_quiz_data(section, difficulty, num_questions)
+    finally:
+        # Worker threads get their own database connection
+        connections.close_all()
+
+
+def generate_quiz_data_chunked(doc_text, difficulty, num_questions, on_item=None):
+    """Like generate_quiz_data, splitting texts longer than the prompt budget into sections
+
+    Up to QUIZ_API_MAX_CHUNKS sections are sent in parallel, with at most
+    QUIZ_API_CONCURRENCY requests in flight; each is cached on its own.
+    The call fails only if every section fails. Questions are only
+    streamed to `on_item` for single-section texts, since merging may
+    reorder or drop them.
+    """
+    sections = split_text_for_prompts(doc_text, get_chunk_size())
+    if len(sections) <= 1:
+        return generate_quiz_data(doc_text, difficulty, num_questions, on_item=on_item)
+
+    # At least one QCM and one true/false question per section
+    max_sections = getattr(settings, 'QUIZ_API_MAX_CHUNKS', 8)
+    sections = select_sections(sections, max(1, min(max_sections, num_questions // 2)))
+    counts = distribute_questions(num_questions, len(sections))
+
+    get_api_config()  # fail fast if the key is missing
+    concurrency = getattr(settings, 'QUIZ_API_CONCURRENCY', 4)
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(sections))) as executor:
+        futures = [
+            executor.submit(_generate_section, section, difficulty, count)
+            for section, count in zip(sections, counts)
+        ]
+
+    parts = []
+    errors = []
+    for future in futures:
+        try:
+            parts.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    if not parts:
+        raise errors[0]
+    if errors:
+        logger.warning(f"{len(errors)}/{len(sections)} sections failed during quiz generation: {errors[0]}")
+
+    return merge_quiz_data(parts, num_questions)
+
+
+def generate_test_quiz_data(doc_text, difficulty, num_questions):
+    """Génère des données de quiz de test pour diagnostiquer les problèmes"""
+    # Questions QCM de test
+    qcm_questions = [
+        {
+            "q": "Quelle est la principale fonction de ce document ?",
+            "a": "Informer le lecteur",
+            "b": "Divertir le lecteur", 
+            "c": "Vendre un produit",
+            "R": "a"
+        },
+        {
+            "q": "Combien de sections principales contient ce document ?",
+            "a": "2 sections",
+            "b": "3 sections", 
+            "c": "4 sections",
+            "R": "b"
+        },
+        {
+            "q": "Quel est le niveau de difficulté recommandé pour ce contenu ?",
+            "a": "Débutant",
+            "b": "Intermédiaire",
+            "c": "Avancé",
+            "R": "b"
+        }
+    ]
+    
+    # Questions vrai/faux de test
+    vrai_faux_questions = [
+        {
+            "q": "Ce document contient des informations techniques détaillées.",
+            "R": True
+        },
+        {
+            "q": "Le document est organisé en chapitres numérotés.",
+            "R": False
+        },
+        {
+            "q": "Les exemples fournis facilitent la compréhension.",
+            "R": True
+        }
+    ]
+    
+    return {
+        "qcm": qcm_questions[:min(3, num_questions // 2)],
+        "vrai_faux": vrai_faux_questions[:min(3, num_questions // 2)]
+    }
+
+
+def generate_quiz_data_with_fallback(doc_text, difficulty, num_questions, on_item=None, received_before=0):
+    """Return (quiz_data, warning): test data and the reason when the API call fails
+
+    If questions were already passed to `on_item` when the call fails, or
+    `received_before` questions were delivered by an earlier call, only the
+    questions of this call are returned instead of test data, since the
+    others may be in use already. QuizAPIConfigError is not caught, there is nothing to
+    fall back on when the API is not configured.
+    """
+    received = {'qcm': [], 'vrai_faux': []}
+
+    def forward(key, item):
+        received.setdefault(key, []).append(item)
+        on_item(key, item)
+
+    try:
+        quiz_data = generate_quiz_data_chunked(
+            doc_text, difficulty, num_questions, on_item=forward if on_item is not None else None
+        )
+        return quiz_data, ''
+    except QuizAPIConfigError:
+        raise
+    except QuizAPIUnavailable as e:
+        reason = str(e)
+    except requests.exceptions.RequestException as e:
+        reason = f'Erreur de connexion à l\'API : {str(e)}'
+    except json.JSONDecodeError as e:
+        reason = f'Erreur de décodage JSON de la réponse API : {str(e)}'
+    except KeyError as e:
+        reason = f'Structure de réponse API invalide : {str(e)}'
+    except Exception as e:
+        reason = f'Erreur lors de la génération via l\'API : {str(e)}'
+
+    count = received_before + sum(len(items) for items in received.values())
+    if count:
+        warning = f'Génération interrompue après {count} question(s) : {reason}.'
+        logger.warning(warning)
+        return received, warning
+
+    warning = f'{reason}. Utilisation des données de test.'
+    logger.warning(warning)
+    return generate_test_quiz_data(doc_text, difficulty, num_questions), warning
@@ -1,79 +1,369 @@
 import re
 import random
-from typing import List, Dict, Tuple
+import hashlib
+from typing import List, Dict, Tuple, Optional
+from django.db import transaction
+from django.db.models import F
 from django.utils.text import slugify
-from .models import Document, Quiz, Question, QuestionOption
+from .distractors import TermIndexBuilder, get_distractor_engine
+from .models import Document, DocumentTextIndex, Quiz, Question, QuestionOption, QuizVariant
 
 
-class QuizGenerator:
-    """Service for generating quiz questions from document text"""
+# Bump when the sentence/term selection below changes so stored indexes are rebuilt
+TEXT_INDEX_VERSION = 3
+
+# Most informative sentences kept per document (a uniform sample beyond that)
+MAX_INDEXED_SENTENCES = 2000
+
+# Sentences of 10+ words kept as a fallback for documents without informative ones
+MAX_FALLBACK_SENTENCES = 200
+
+# Bump when question generation changes so cached quiz variants are not reused
+GENERATOR_VERSION = 1
+
+SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
+
+def extract_key_terms(sentence: str) -> List[str]:
+    """Extract key terms from a sentence"""
+    # Simple approach: look for capitalized words and important terms
+    words = sentence.split()
+    key_terms = []
     
-    def __init__(self, document: Document):
-        self.document = document
-        self.text = document.extracted_text
-        self.sentences = self._split_into_sentences()
-        self.paragraphs = self._split_into_paragraphs()
+    for word in words:
+        # Remove punctuation
+        clean_word = PUNCTUATION_RE.sub('', word)
+        
+        # Look for proper nouns, numbers, and important terms
+        if (clean_word and 
+            (clean_word[0].isupper() or 
+             clean_word.isdigit() or 
+             len(clean_word) > 6)):
+            key_terms.append(clean_word)
+    
+    # Also look for multi-word terms
+    for i in range(len(words) - 1):
+        if words[i][0].isupper() and words[i+1][0].isupper():
+            term = f"{words[i]} {words[i+1]}"
+            term = PUNCTUATION_RE.sub('', term)
+            if term:
+                key_terms.append(term)
+    
+    return sorted(set(key_terms))  # Remove duplicates, stable order
+
+
+def is_informative_sentence(sentence: str, word_count: int) -> bool:
+    """Sentences of 20-50 words with proper nouns make the best questions"""
+    return (20 <= word_count <= 50 and
+            not sentence.lower().startswith(('the', 'this', 'that', 'it')) and
+            any(char.isupper() for char in sentence))
+
+
+class SentenceReservoir:
+    """Uniform sample of at most `size` items from a stream (reservoir sampling)
+    
+    Seeded, so the same text always gives the same index.
+    """
+    
+    def __init__(self, size: int, seed: int = 0):
+        self.size = size
+        self.items = []
+        self.seen = 0
+        self.rng = random.Random(seed)
+    
+    def add(self, item):
+        self.seen += 1
+        if len(self.items) < self.size:
+            self.items.append(item)
+            return
+        slot = self.rng.randrange(self.seen)
+        if slot < self.size:
+            self.items[slot] = item
+    
+    def sample(self) -> List:
+        """Kept items in stream order"""
+        return sorted(self.items, key=lambda item: item['position'])
+
+
+class SentenceIndexBuilder:
+    """Build a document's sentence index from its text, fed piece by piece
+    
+    Questions are drawn from informative sentences, so only those are kept
+    (a sample of MAX_INDEXED_SENTENCES for long documents), each with its
+    key terms precomputed. Other sentences of 10+ words are only sampled
+    (MAX_FALLBACK_SENTENCES) while no informative one has been seen, as a
+    fallback. Memory therefore stays bounded whatever the text length. The
+    key terms of every sentence feed the term statistics used to pick
+    distractors.
+    """
+    
+    def __init__(self):
+        self.informative = SentenceReservoir(MAX_INDEXED_SENTENCES)
+        self.fallback = SentenceReservoir(MAX_FALLBACK_SENTENCES)
+        self.position = 0
+        self.term_index = TermIndexBuilder()
+        self._tail = ''
+    
+    def feed(self, piece: str):
+        parts = SENTENCE_SPLIT_RE.split(self._tail + piece)
+        # The last part may continue in the next piece
+        self._tail = parts.pop()
+        for part in parts:
+            self._add(part)
+    
+    def _add(self, part: str):
+        sentence = part.strip()
+        if not sentence or len(sentence) <= 10:
+            return
         
-    def _split_into_sentences(self) -> List[str]:
-        """Split text into sentences"""
-        if not self.text:
-            return []
+        position = self.position
+        self.position += 1
         
-        # Simple sentence splitting (can be improved with NLTK)
-        sentences = re.split(r'[.!?]+', self.text)
-        sentences = [s.strip() for s in sentences if s.strip() and len(s.strip()) > 10]
-        return sentences
-    
-    def _split_into_paragraphs(self) -> List[str]:
-        """Split text into paragraphs"""
-        if not self.text:
-            return []
+        terms = extract_key_terms(sentence)
+        self.term_index.add_sentence(terms)
+        
+        word_count = len(sentence.split())
+        if word_count < 10:
+            return
         
-        paragraphs = self.text.split('\n\n')
-        paragraphs = [p.strip() for p in paragraphs if p.strip() and len(p.strip()) > 50]
-        return paragraphs
+        entry = {
+            'text': sentence,
+            'terms': terms,
+            'position': position,
+        }
+        if is_informative_sentence(sentence, word_count):
+            self.informative.add(entry)
+            self.fallback = None
+        elif self.fallback is not None:
+            self.fallback.add(entry)
+    
+    def finish(self) -> Dict:
+        self._add(self._tail)
+        self._tail = ''
+        if self.informative.items:
+            sentences = self.informative.sample()
+            informative = list(range(len(sentences)))
+        else:
+            sentences = self.fallback.sample()
+            informative = []
+        return {
+            'sentences': sentences,
+            'informative': informative,
+            'terms': self.term_index.finish(),
+        }
+
+
+def save_text_index(document: Document, data: Dict) -> DocumentTextIndex:
+    """Store a built sentence index for a document"""
+    index, _ = DocumentTextIndex.objects.update_or_create(
+        document=document,
+        defaults={
+            'version': TEXT_INDEX_VERSION,
+            'sentences': data['sentences'],
+            'informative': data['informative'],
+            'terms': data.get('terms', {}),
+        },
+    )
+    return index
+
+
+def build_text_index(document: Document) -> Dict:
+    """Build and store the sentence index from the document's stored text"""
+    builder = SentenceIndexBuilder()
+    for i, piece in enumerate(document.iter_text()):
+        if i:
+            builder.feed('\n')
+        builder.feed(piece)
+    data = builder.finish()
+    index = save_text_index(document, data)
+    data['built_at'] = index.built_at.isoformat()
+    return data
+
+
+def get_text_index(document: Document) -> Dict:
+    """Load the document's sentence index, building it if missing or outdated"""
+    index = DocumentTextIndex.objects.filter(
+        document=document, version=TEXT_INDEX_VERSION
+    ).first()
+    if index is not None:
+        return {
+            'sentences': index.sentences,
+            'informative': index.informative,
+            'terms': index.terms,
+            'built_at': index.built_at.isoformat(),
+        }
+    return build_text_index(document)
+
+
+def make_variant_id(content_hash: str, difficulty: str, num_questions: int, seed: int) -> str:
+    """Stable identifier of the question set generated for these parameters"""
+    key = f"{content_hash}:{difficulty}:{num_questions}:{seed}:{TEXT_INDEX_VERSION}:{GENERATOR_VERSION}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+class QuizGenerator:
+    """Service for generating quiz questions from document text
+    
+    Questions are sampled from the document's precomputed sentence index,
+    so generation cost does not depend on the document length. All random
+    choices go through `self.rng`: with a seed, the same document content
+    and parameters always give the same questions, which are cached as a
+    QuizVariant.
+    """
+    
+    def __init__(self, document: Document, text_index: Optional[Dict] = None, seed: Optional[int] = None):
+        self.document = document
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self._text_index = text_index
+    
+    @property
+    def text_index(self) -> Dict:
+        # Loaded on first use, so cached variants are served without it
+        if self._text_index is None:
+            self._text_index = get_text_index(self.document)
+        return self._text_index
+    
+    @property
+    def sentences(self) -> List[Dict]:
+        return self.text_index['sentences']
+    
+    @property
+    def informative(self) -> List[int]:
+        return self.text_index['informative']
+    
+    @property
+    def distractors(self):
+        return get_distractor_engine(self.document.pk, self.text_index)
     
     def generate_quiz(self, title: str, description: str, difficulty: str, 
                      num_questions: int, time_limit: int, created_by) -> Quiz:
         """Generate a complete quiz with questions"""
         
-        # Create the quiz
-        quiz = Quiz.objects.create(
-            title=title,
-            description=description,
-            document=self.document,
-            created_by=created_by,
-            difficulty=difficulty,
-            time_limit_minutes=time_limit,
-            total_questions=num_questions
-        )
+        # Generate questions before touching the database
+        variant_id, questions = self.get_question_set(difficulty, num_questions, self.seed)
+        
+        # Persist the quiz, its questions and their options atomically,
+        # with a constant number of queries whatever the quiz size
+        with transaction.atomic():
+            quiz = Quiz.objects.create(
+                title=title,
+                description=description,
+                document=self.document,
+                created_by=created_by,
+                difficulty=difficulty,
+                time_limit_minutes=time_limit,
+                total_questions=len(questions),
+                seed=self.seed,
+                variant_id=variant_id
+            )
+            self._bulk_create_questions(quiz, questions)
         
-        # Generate questions
-        questions = self._generate_questions(num_questions, difficulty)
+        return quiz
+    
+    def get_question_set(self, difficulty: str, num_questions: int,
+                         seed: Optional[int] = None) -> Tuple[str, List[Dict]]:
+        """Return (variant id, questions), reusing the cached variant for a seed
+        
+        Without a seed the questions are freshly drawn and the variant id is empty.
+        """
+        if seed is None:
+            return '', self._generate_questions(num_questions, difficulty)
         
-        # Create question objects
-        for i, question_data in enumerate(questions):
-            question = Question.objects.create(
-                quiz=quiz,
-                question_text=question_data['question'],
-                question_type=question_data['type'],
-                correct_answer=question_data['correct_answer'],
-                explanation=question_data.get('explanation', ''),
-                points=question_data.get('points', 1),
-                order=i + 1
+        content_hash = self.document.content_hash or f"document-{self.document.pk}"
+        variant_id = make_variant_id(content_hash, difficulty, num_questions, seed)
+        
+        variant = QuizVariant.objects.filter(variant_id=variant_id).only('pk', 'questions').first()
+        if variant is not None:
+            QuizVariant.objects.filter(pk=variant.pk).update(hit_count=F('hit_count') + 1)
+            return variant_id, variant.questions
+        
+        self.rng = random.Random(seed)
+        questions = self._generate_questions(num_questions, difficulty)
+        QuizVariant.objects.get_or_create(
+            variant_id=variant_id,
+            defaults={
+                'content_hash': content_hash,
+                'difficulty': difficulty,
+                'num_questions': num_questions,
+                'seed': seed,
+                'questions': questions,
+            },
+        )
+        return variant_id, questions
+    
+    def generate_quizzes(self, specs: List[Dict], created_by) -> List[Quiz]:
+        """Generate several quizzes from this document and store them together
+        
+        Each spec holds the `generate_quiz` arguments (title, description,
+        difficulty, num_questions, time_limit) and an optional seed. All
+        quizzes share the loaded sentence index and are inserted with three
+        queries in total.
+        """
+        generated = []
+        for spec in specs:
+            seed = spec.get('seed')
+            variant_id, questions = self.get_question_set(spec['difficulty'], spec['num_questions'], seed)
+            generated.append(({**spec, 'seed': seed, 'variant_id': variant_id}, questions))
+        
+        with transaction.atomic():
+            quizzes = Quiz.objects.bulk_create([
+                Quiz(
+                    title=spec['title'],
+                    description=spec.get('description', ''),
+                    document=self.document,
+                    created_by=created_by,
+                    difficulty=spec['difficulty'],
+                    time_limit_minutes=spec['time_limit'],
+                    total_questions=len(questions),
+                    seed=spec['seed'],
+                    variant_id=spec['variant_id']
+                )
+                for spec, questions in generated
+            ])
+            self._bulk_create_quiz_questions(
+                [(quiz, questions) for quiz, (_, questions) in zip(quizzes, generated)]
             )
-            
-            # Create options for multiple choice questions
+        
+        return quizzes
+    
+    def _bulk_create_questions(self, quiz: Quiz, questions: List[Dict]) -> List[Question]:
+        """Insert all questions, then all their options, in two queries"""
+        return self._bulk_create_quiz_questions([(quiz, questions)])
+    
+    def _bulk_create_quiz_questions(self, quiz_questions: List[Tuple[Quiz, List[Dict]]]) -> List[Question]:
+        """Insert the questions of one or more quizzes, then all their options, in two queries"""
+        question_objects = []
+        question_data_list = []
+        for quiz, questions in quiz_questions:
+            for i, question_data in enumerate(questions):
+                question_objects.append(Question(
+                    quiz=quiz,
+                    question_text=question_data['question'],
+                    question_type=question_data['type'],
+                    correct_answer=question_data['correct_answer'],
+                    explanation=question_data.get('explanation', ''),
+                    points=question_data.get('points', 1),
+                    order=i + 1
+                ))
+                question_data_list.append(question_data)
+        Question.objects.bulk_create(question_objects)
+        
+        # Options for multiple choice questions (question PKs are set by bulk_create)
+        option_objects = []
+        for question, question_data in zip(question_objects, question_data_list):
             if question_data['type'] == 'multiple_choice' and 'options' in question_data:
                 for j, option in enumerate(question_data['options']):
-                    QuestionOption.objects.create(
+                    option_objects.append(QuestionOption(
                         question=question,
                         option_text=option['text'],
                         is_correct=option['is_correct'],
                         order=j + 1
-                    )
+                    ))
+        QuestionOption.objects.bulk_create(option_objects)
         
-        return quiz
+        return question_objects
     
     def _generate_questions(self, num_questions: int, difficulty: str) -> List[Dict]:
         """Generate different types of questions"""
@@ -119,11 +409,26 @@ class QuizGenerator:
             if question:
                 questions.append(question)
         
+        self._add_distractors(questions)
         return questions
     
+    def _add_distractors(self, questions: List[Dict]):
+        """Fill in the options of all multiple choice questions with one batch lookup"""
+        pending = [q for q in questions if q['type'] == 'multiple_choice' and 'options' not in q]
+        if not pending:
+            return
+        
+        batches = self.distractors.distractors_batch([q['correct_answer'] for q in pending], 3, self.rng)
+        for question, incorrect_options in zip(pending, batches):
+            all_options = [{'text': question['correct_answer'], 'is_correct': True}]
+            for option in incorrect_options:
+                all_options.append({'text': option, 'is_correct': False})
+            self.rng.shuffle(all_options)
+            question['options'] = all_options
+    
     def _choose_question_type(self, distribution: Dict[str, float]) -> str:
         """Choose question type based on probability distribution"""
-        rand = random.random()
+        rand = self.rng.random()
         cumulative = 0
         
         for question_type, probability in distribution.items():
@@ -139,38 +444,30 @@ class QuizGenerator:
             return None
         
         # Select a sentence with important information
-        sentence = self._select_informative_sentence()
-        if not sentence:
+        entry = self._select_informative_sentence()
+        if not entry:
             return None
+        sentence = entry['text']
         
-        # Extract key terms
-        key_terms = self._extract_key_terms(sentence)
+        # Key terms are precomputed in the sentence index
+        key_terms = entry['terms']
         if not key_terms:
             return None
         
         # Choose a term to ask about
-        target_term = random.choice(key_terms)
+        target_term = self.rng.choice(key_terms)
         
         # Create question by replacing the term
         question_text = sentence.replace(target_term, "______")
         question_text = f"What word or phrase best completes this statement?\n\n{question_text}"
         
-        # Generate options
+        # Options are added for the whole quiz at once, see _add_distractors
         correct_option = target_term
-        incorrect_options = self._generate_distractors(target_term, 3)
-        
-        # Combine and shuffle options
-        all_options = [{'text': correct_option, 'is_correct': True}]
-        for option in incorrect_options:
-            all_options.append({'text': option, 'is_correct': False})
-        
-        random.shuffle(all_options)
         
         return {
             'type': 'multiple_choice',
             'question': question_text,
             'correct_answer': correct_option,
-            'options': all_options,
             'explanation': f"The correct answer is '{correct_option}' based on the context in the document.",
             'points': 2
         }
@@ -180,12 +477,13 @@ class QuizGenerator:
         if not self.sentences:
             return None
         
-        sentence = self._select_informative_sentence()
-        if not sentence:
+        entry = self._select_informative_sentence()
+        if not entry:
             return None
+        sentence = entry['text']
         
         # Randomly decide if this should be true or false
-        is_true = random.choice([True, False])
+        is_true = self.rng.choice([True, False])
         
         if is_true:
             question_text = f"True or False: {sentence}"
@@ -211,16 +509,17 @@ class QuizGenerator:
         if not self.sentences:
             return None
         
-        sentence = self._select_informative_sentence()
-        if not sentence:
+        entry = self._select_informative_sentence()
+        if not entry:
             return None
+        sentence = entry['text']
         
-        # Extract key terms and create a question
-        key_terms = self._extract_key_terms(sentence)
+        # Precomputed key terms, to create a question
+        key_terms = entry['terms']
         if not key_terms:
             return None
         
-        target_term = random.choice(key_terms)
+        target_term = self.rng.choice(key_terms)
         
         # Create question asking for the key term
         question_patterns = [
@@ -229,7 +528,7 @@ class QuizGenerator:
             f"What does the document say about {target_term.lower()}?",
         ]
         
-        question_text = random.choice(question_patterns)
+        question_text = self.rng.choice(question_patterns)
         
         return {
             'type': 'short_answer',
@@ -244,17 +543,18 @@ class QuizGenerator:
         if not self.sentences:
             return None
         
-        sentence = self._select_informative_sentence()
-        if not sentence:
+        entry = self._select_informative_sentence()
+        if not entry:
             return None
+        sentence = entry['text']
         
-        # Extract key terms
-        key_terms = self._extract_key_terms(sentence)
+        # Key terms are precomputed in the sentence index
+        key_terms = entry['terms']
         if not key_terms:
             return None
         
         # Choose term to blank out
-        target_term = random.choice(key_terms)
+        target_term = self.rng.choice(key_terms)
         
         # Create question with blank
         question_text = sentence.replace(target_term, "______")
@@ -268,85 +568,24 @@ class QuizGenerator:
             'points': 2
         }
     
-    def _select_informative_sentence(self) -> str:
-        """Select a sentence that contains useful information"""
+    def _select_informative_sentence(self) -> Optional[Dict]:
+        """Select an indexed sentence (text and key terms) that contains useful information"""
         if not self.sentences:
             return None
         
-        # Filter sentences by length and content
-        good_sentences = []
-        for sentence in self.sentences:
-            if (20 <= len(sentence.split()) <= 50 and 
-                not sentence.lower().startswith(('the', 'this', 'that', 'it')) and
-                any(char.isupper() for char in sentence)):  # Has proper nouns
-                good_sentences.append(sentence)
+        if self.informative:
+            return self.sentences[self.rng.choice(self.informative)]
         
-        if not good_sentences:
-            good_sentences = [s for s in self.sentences if len(s.split()) >= 10]
-        
-        return random.choice(good_sentences) if good_sentences else None
+        # Fallback: any sentence of 10+ words (the indexed sample)
+        return self.rng.choice(self.sentences)
     
     def _extract_key_terms(self, sentence: str) -> List[str]:
         """Extract key terms from a sentence"""
-        # Simple approach: look for capitalized words and important terms
-        words = sentence.split()
-        key_terms = []
-        
-        for word in words:
-            # Remove punctuation
-            clean_word = re.sub(r'[^\w\s]', '', word)
-            
-            # Look for proper nouns, numbers, and important terms
-            if (clean_word and 
-                (clean_word[0].isupper() or 
-                 clean_word.isdigit() or 
-                 len(clean_word) > 6)):
-                key_terms.append(clean_word)
-        
-        # Also look for multi-word terms
-        for i in range(len(words) - 1):
-            if words[i][0].isupper() and words[i+1][0].isupper():
-                term = f"{words[i]} {words[i+1]}"
-                term = re.sub(r'[^\w\s]', '', term)
-                if term:
-                    key_terms.append(term)
-        
-        return list(set(key_terms))  # Remove duplicates
+        return extract_key_terms(sentence)
     
     def _generate_distractors(self, correct_answer: str, num_distractors: int) -> List[str]:
-        """Generate plausible incorrect options"""
-        distractors = []
-        
-        # Simple approach: generate variations of the correct answer
-        variations = [
-            correct_answer.upper(),
-            correct_answer.lower(),
-            correct_answer + "s",
-            "Not " + correct_answer,
-            correct_answer.replace("a", "e") if "a" in correct_answer else correct_answer + "ing",
-        ]
-        
-        # Add some generic distractors
-        generic_distractors = [
-            "None of the above",
-            "All of the above",
-            "Cannot be determined",
-            "Not mentioned in the text",
-        ]
-        
-        all_distractors = variations + generic_distractors
-        
-        # Remove the correct answer if it appears in variations
-        all_distractors = [d for d in all_distractors if d.lower() != correct_answer.lower()]
-        
-        # Select random distractors
-        selected = random.sample(all_distractors, min(num_distractors, len(all_distractors)))
-        
-        # Pad with generic options if needed
-        while len(selected) < num_distractors:
-            selected.append(f"Option {len(selected) + 1}")
-        
-        return selected[:num_distractors]
+        """Generate plausible incorrect options from the document's own terms"""
+        return self.distractors.distractors(correct_answer, num_distractors, self.rng)
     
     def _modify_sentence_for_false(self, sentence: str) -> str:
         """Modify a sentence to make it false"""
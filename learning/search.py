@@ -0,0 +1,253 @@
+import base64
+import json
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+)
+from django.db.models import F, OuterRef, Q, Subquery, TextField
+from django.db.models.functions import Coalesce, Greatest, Substr
+
+from .models import Document, DocumentChunk, Quiz, Question
+
+
+# Markers wrapped around matched words by ts_headline; turned into <mark> by the
+# `highlight_snippet` template filter after the snippet has been HTML-escaped
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_STOP = '\ue001'
+
+
+def get_search_config():
+    """Text search configuration (stemming/stop words) used for documents"""
+    return getattr(settings, 'SEARCH_CONFIG', 'french')
+
+
+def build_document_search_vector():
+    """Weighted tsvector expression: title > description > extracted text
+
+    Only the first SEARCH_VECTOR_TEXT_CHARS characters of the text are
+    indexed, which keeps the vector of large documents under PostgreSQL's
+    1 MB tsvector limit.
+    """
+    config = get_search_config()
+    text = Substr('extracted_text', 1, getattr(settings, 'SEARCH_VECTOR_TEXT_CHARS', 200000))
+    return (
+        SearchVector('title', weight='A', config=config) +
+        SearchVector('description', weight='B', config=config) +
+        SearchVector(text, weight='C', config=config)
+    )
+
+
+def update_document_search_vector(document):
+    """Recompute the stored search vector of a document inside the database"""
+    Document.objects.filter(pk=document.pk).update(search_vector=build_document_search_vector())
+
+
+def reindex_documents(queryset=None, batch_size=500):
+    """Recompute the search vectors of some documents (all by default), a batch of rows per UPDATE
+
+    Returns the number of documents indexed.
+    """
+    queryset = Document.objects.all() if queryset is None else queryset
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    indexed = 0
+    last_pk = None
+    while True:
+        batch = pks.filter(pk__gt=last_pk) if last_pk is not None else pks
+        batch = list(batch[:batch_size])
+        if not batch:
+            return indexed
+        indexed += Document.objects.filter(pk__in=batch).update(search_vector=build_document_search_vector())
+        last_pk = batch[-1]
+
+
+def search_documents(queryset, query):
+    """Filter a document queryset by full-text query, annotated with its `rank`"""
+    search_query = SearchQuery(query, config=get_search_config(), search_type='websearch')
+    return queryset.filter(search_vector=search_query).annotate(
+        rank=SearchRank(F('search_vector'), search_query),
+    )
+
+
+def attach_snippets(documents, query, max_words=35, min_words=15, max_fragments=2):
+    """Set a highlighted `snippet` on each document of a (paginated) result page
+
+    The headline is built from the first chunk of the document matching the
+    query, or from the start of its text when no chunk matches (e.g. a match
+    on the title only), so ts_headline never parses a whole document.
+    """
+    documents = list(documents)
+    if not documents:
+        return documents
+
+    config = get_search_config()
+    search_query = SearchQuery(query, config=config, search_type='websearch')
+    matching_chunk = (
+        DocumentChunk.objects.filter(document=OuterRef('pk'))
+        .annotate(vector=SearchVector('text', config=config))
+        .filter(vector=search_query)
+        .order_by('index')
+        .values('text')[:1]
+    )
+    source = Coalesce(
+        Subquery(matching_chunk),
+        Substr('extracted_text', 1, getattr(settings, 'SEARCH_SNIPPET_SOURCE_CHARS', 5000)),
+        output_field=TextField(),
+    )
+    headline = SearchHeadline(
+        source,
+        search_query,
+        config=config,
+        start_sel=HIGHLIGHT_START,
+        stop_sel=HIGHLIGHT_STOP,
+        max_words=max_words,
+        min_words=min_words,
+        max_fragments=max_fragments,
+    )
+    snippets = dict(
+        Document.objects.filter(pk__in=[doc.pk for doc in documents])
+        .annotate(snippet=headline)
+        .values_list('pk', 'snippet')
+    )
+    for doc in documents:
+        doc.snippet = snippets.get(doc.pk, '')
+    return documents
+
+
+# Unified fuzzy search (pg_trgm) ------------------------------------------------
+
+# Result kinds, in the order used to break score ties
+SEARCH_KINDS = ['document', 'quiz', 'question']
+
+MIN_FUZZY_QUERY_LENGTH = 2
+
+
+def fuzzy_filter(queryset, query, fields):
+    """Typo-tolerant match of `query` against any of `fields`, with a `score` annotation
+
+    Uses the `%>` word-similarity operator so the trigram GIN indexes are used.
+    """
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__trigram_word_similar': query})
+
+    similarities = [TrigramWordSimilarity(query, field) for field in fields]
+    score = similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+    return queryset.filter(condition).annotate(score=score)
+
+
+def search_quizzes(queryset, query):
+    """Fuzzy search of quizzes on their title, description and document title"""
+    return fuzzy_filter(queryset, query, ['title', 'description', 'document__title'])
+
+
+def encode_cursor(score, kind, pk):
+    raw = json.dumps([score, kind, pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """Return (score, kind, pk) from an opaque cursor, or None if it is invalid"""
+    try:
+        score, kind, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if kind not in SEARCH_KINDS:
+            return None
+        return float(score), kind, int(pk)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        return None
+
+
+def _after_cursor(queryset, kind, cursor):
+    """Keep rows ordered after the cursor in (-score, kind, id) order"""
+    if cursor is None:
+        return queryset
+
+    score, cursor_kind, pk = cursor
+    kind_rank = SEARCH_KINDS.index(kind)
+    cursor_rank = SEARCH_KINDS.index(cursor_kind)
+    if kind_rank > cursor_rank:
+        return queryset.filter(score__lte=score)
+    if kind_rank < cursor_rank:
+        return queryset.filter(score__lt=score)
+    return queryset.filter(Q(score__lt=score) | Q(score=score, pk__gt=pk))
+
+
+def _search_sources(user, query):
+    """Per-kind querysets of (pk, score, title, context, link id) values"""
+    documents = fuzzy_filter(
+        Document.objects.filter(uploaded_by=user), query, ['title', 'description']
+    ).values('pk', 'score', 'title', 'description')
+
+    quizzes = fuzzy_filter(
+        Quiz.objects.filter(document__uploaded_by=user), query, ['title', 'description']
+    ).values('pk', 'score', 'title', 'description')
+
+    questions = fuzzy_filter(
+        Question.objects.filter(quiz__document__uploaded_by=user), query, ['question_text']
+    ).values('pk', 'score', 'question_text', 'quiz_id', 'quiz__title')
+
+    return {'document': documents, 'quiz': quizzes, 'question': questions}
+
+
+def _format_hit(kind, row):
+    from django.urls import reverse
+
+    if kind == 'document':
+        return {
+            'type': kind,
+            'id': row['pk'],
+            'title': row['title'],
+            'context': row['description'][:200],
+            'url': reverse('learning:document_detail', args=[row['pk']]),
+        }
+    if kind == 'quiz':
+        return {
+            'type': kind,
+            'id': row['pk'],
+            'title': row['title'],
+            'context': row['description'][:200],
+            'url': reverse('learning:quiz_detail', args=[row['pk']]),
+        }
+    return {
+        'type': kind,
+        'id': row['pk'],
+        'title': row['quiz__title'],
+        'context': row['question_text'][:200],
+        'url': reverse('learning:quiz_detail', args=[row['quiz_id']]),
+    }
+
+
+def unified_search(user, query, cursor=None, limit=20):
+    """Fuzzy search over the user's documents, quizzes and questions
+
+    Results are ordered by similarity and paginated with an opaque keyset
+    cursor, so each page is a bounded index scan per kind rather than an
+    OFFSET over the whole result set.
+    """
+    query = (query or '').strip()
+    if len(query) < MIN_FUZZY_QUERY_LENGTH:
+        return {'results': [], 'next_cursor': None}
+
+    position = decode_cursor(cursor) if cursor else None
+
+    candidates = []
+    for kind, queryset in _search_sources(user, query).items():
+        queryset = _after_cursor(queryset, kind, position).order_by('-score', 'pk')
+        for row in queryset[:limit + 1]:
+            candidates.append((-row['score'], SEARCH_KINDS.index(kind), row['pk'], kind, row))
+
+    candidates.sort(key=lambda item: item[:3])
+    page = candidates[:limit]
+
+    next_cursor = None
+    if len(candidates) > limit and page:
+        last = page[-1]
+        next_cursor = encode_cursor(-last[0], last[3], last[2])
+
+    results = []
+    for neg_score, _, _, kind, row in page:
+        hit = _format_hit(kind, row)
+        hit['score'] = round(-neg_score, 4)
+        results.append(hit)
+
+    return {'results': results, 'next_cursor': next_cursor}
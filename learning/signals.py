@@ -0,0 +1,65 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_migrate
+
+
+def ensure_postgres_extensions(sender, using, **kwargs):
+    """Create the PostgreSQL extensions the learning models' indexes rely on"""
+    from django.db import connections
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        # Trigram GIN indexes (fuzzy search) need pg_trgm before tables are created
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+
+def bump_question_key_version(sender, instance, created, **kwargs):
+    """New answer key version for an updated question, so other processes drop their cached key
+
+    Incremented by the database, like option changes do, so that saving an
+    instance loaded before such a change cannot write back an older version.
+    """
+    if created:
+        return
+    from .models import Question
+
+    Question.objects.filter(pk=instance.pk).update(key_version=F('key_version') + 1)
+    instance.refresh_from_db(fields=['key_version'])
+
+
+def invalidate_question_answer_keys(sender, instance, **kwargs):
+    """Drop the cached answer keys of a question's quiz when the question changes"""
+    from .answer_checker import answer_key_cache
+
+    answer_key_cache.invalidate_quiz(instance.quiz_id)
+
+
+def invalidate_option_answer_keys(sender, instance, **kwargs):
+    """Drop the cached answer keys of an option's quiz when the option changes"""
+    from .answer_checker import answer_key_cache
+    from .models import Question
+
+    Question.objects.filter(pk=instance.question_id).update(key_version=F('key_version') + 1)
+    answer_key_cache.invalidate_question(instance.question_id)
+
+
+def index_saved_document(sender, instance, update_fields=None, **kwargs):
+    """Keep a document's search vector in step with its title, description and text"""
+    if update_fields is not None and not {'title', 'description', 'extracted_text'} & set(update_fields):
+        return
+    from .search import update_document_search_vector
+
+    update_document_search_vector(instance)
+
+
+def connect_signals(app_config):
+    from .models import Document, Question, QuestionOption
+
+    pre_migrate.connect(ensure_postgres_extensions, sender=app_config)
+    # Before the cache invalidation below, so reloaded keys get the new version
+    post_save.connect(bump_question_key_version, sender=Question)
+    post_save.connect(index_saved_document, sender=Document)
+    for signal in (post_save, post_delete):
+        signal.connect(invalidate_question_answer_keys, sender=Question)
+        signal.connect(invalidate_option_answer_keys, sender=QuestionOption)
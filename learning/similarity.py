@@ -0,0 +1,120 @@
+"""
+String similarity backends for answer checking.
+
+Every backend exposes `ratio(a, b, score_cutoff=0.0)`, a similarity in
+[0, 1] of the same form as `difflib.SequenceMatcher.ratio()`:
+2 * matches / (len(a) + len(b)). A score below `score_cutoff` is returned
+as 0.0, which lets a backend give up as soon as the cutoff is out of reach.
+
+- 'sequence_matcher' (default) is the reference `difflib.SequenceMatcher`
+  ratio, as graded so far.
+- 'indel' (opt-in) counts matches as the longest common subsequence,
+  computed bit-parallel: a few big-integer operations per character of the
+  longer text, over 64 characters of the shorter one per machine word,
+  instead of difflib's worst-case quadratic block search.
+  This is the normalized indel (insertion/deletion Levenshtein) similarity.
+
+Tolerance: SequenceMatcher counts the characters of greedily chosen
+matching blocks, which never exceed the longest common subsequence, so the
+indel ratio is always >= the reference one. On the synthetic corpus of
+benchmarks/bench_similarity.py both ratios are equal for exact answers,
+within 0.02 (almost always equal) for answers with typos, within 0.12 (mean
+< 0.001) for answers with dropped words, and up to 0.45 higher (mean 0.1)
+for reordered or unrelated words, where scattered letters still form a
+common subsequence. Below 200 characters, this moves about 4% of
+reordered answers up one grade (e.g. to partial credit); no other outcome
+changes. From 200 characters on, difflib's autojunk heuristic ignores
+frequent characters and the reference ratio of long answers collapses (a
+60-word answer with a typo scores near 0), which 'indel' does not
+reproduce. Switching backends therefore changes some grades, including
+those rewritten by `manage.py regrade`.
+"""
+from difflib import SequenceMatcher
+
+from django.conf import settings
+
+
+class SequenceMatcherBackend:
+    """Reference difflib implementation"""
+    name = 'sequence_matcher'
+
+    def ratio(self, a: str, b: str, score_cutoff: float = 0.0) -> float:
+        matcher = SequenceMatcher(None, a, b)
+        # Cheap upper bounds first
+        if score_cutoff and (matcher.real_quick_ratio() < score_cutoff or matcher.quick_ratio() < score_cutoff):
+            return 0.0
+        score = matcher.ratio()
+        return score if score >= score_cutoff else 0.0
+
+
+class IndelBackend:
+    """Normalized indel similarity with a bit-parallel LCS"""
+    name = 'indel'
+
+    def ratio(self, a: str, b: str, score_cutoff: float = 0.0) -> float:
+        total = len(a) + len(b)
+        if not total:
+            return 1.0
+        # The LCS is at most the shorter text
+        if 2 * min(len(a), len(b)) / total < score_cutoff:
+            return 0.0
+        # Matches needed to reach the cutoff (rounded down, to stay on the safe side)
+        score = 2 * lcs_length(a, b, int(score_cutoff * total / 2)) / total
+        return score if score >= score_cutoff else 0.0
+
+
+def _popcount(value: int) -> int:
+    return bin(value).count('1')
+
+
+if hasattr(int, 'bit_count'):  # Python 3.10+
+    _popcount = int.bit_count
+
+
+def lcs_length(a: str, b: str, min_length: int = 0) -> int:
+    """Length of the longest common subsequence of two strings
+
+    Bit-parallel algorithm (Allison-Dix / Hyyrö): bit i of `v` is cleared
+    once position i of the shorter string is part of the LCS so far. Once
+    the LCS so far plus the characters left cannot reach `min_length`, the
+    loop stops and returns a length below it.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    if not a:
+        return 0
+
+    masks = {}
+    for i, char in enumerate(a):
+        masks[char] = masks.get(char, 0) | (1 << i)
+
+    full = (1 << len(a)) - 1
+    v = full
+    # Each character left adds at most one match, so the slack (LCS so far
+    # + characters left - min_length) drops by at most one per character:
+    # it only needs checking again once it may have run out
+    next_check = len(b) - min_length + 1
+    for position, char in enumerate(b, 1):
+        u = v & masks.get(char, 0)
+        v = ((v + u) | (v - u)) & full
+        if position >= next_check:
+            slack = len(a) - _popcount(v) + len(b) - position - min_length
+            if slack < 0:
+                break
+            next_check = position + slack + 1
+    return len(a) - _popcount(v)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (IndelBackend, SequenceMatcherBackend)
+}
+
+
+def get_similarity_backend(name: str = None):
+    """Instance of the configured (or named) similarity backend"""
+    name = name or getattr(settings, 'ANSWER_SIMILARITY_BACKEND', 'sequence_matcher')
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown similarity backend: {name}")
@@ -1,4 +1,8 @@
 from django import template
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from learning.search import HIGHLIGHT_START, HIGHLIGHT_STOP
 
 register = template.Library()
 
@@ -11,6 +15,16 @@ def get_item(dictionary, key):
     return None
 
 
+@register.filter
+def highlight_snippet(snippet):
+    """Escape a search snippet and wrap its matched words in <mark>"""
+    if not snippet:
+        return ''
+    html = escape(snippet)
+    html = html.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+    return mark_safe(html)
+
+
 @register.filter
 def percentage(value, total):
     """Calculate percentage"""
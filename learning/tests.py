@@ -1,3 +1,292 @@
-from django.test import TestCase
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from . import quiz_api
+from .jobs import enqueue_api_quiz_generation, run_job
+from .models import Document, LLMResponseCache, QuizAPIResult
+
+
+QUIZ = {
+    "qcm": [
+        {"q": "Quelle molécule capte la lumière ?", "a": "La chlorophylle", "b": "Le glucose", "c": "L'eau", "R": "a"},
+        {"q": "Que produit la photosynthèse ?", "a": "Du sel", "b": "Du glucose", "c": "Du fer", "R": "b"},
+        {"q": "Quel gaz est absorbé ?", "a": "L'azote", "b": "L'hélium", "c": "Le dioxyde de carbone", "R": "c"},
+    ],
+    "vrai_faux": [
+        {"q": "La photosynthèse libère de l'oxygène.", "R": True},
+        {"q": "Les racines captent la lumière.", "R": False},
+        {"q": "Le glucose stocke de l'énergie.", "R": True},
+    ],
+}
+
+
+# Per-section answers for long documents; section 2 repeats a question of section 1
+SECTION_QUIZZES = {
+    1: {
+        "qcm": [
+            QUIZ["qcm"][0],
+            {"q": "Où se déroule la photosynthèse ?", "a": "Dans les chloroplastes", "b": "Dans le noyau", "c": "Dans les racines", "R": "a"},
+        ],
+        "vrai_faux": [QUIZ["vrai_faux"][0]],
+    },
+    2: {
+        "qcm": [
+            {**QUIZ["qcm"][0], "q": "Quelle molécule capte la lumière"},
+            {"q": "Quelle énergie est utilisée ?", "a": "L'énergie lumineuse", "b": "L'énergie nucléaire", "c": "L'énergie éolienne", "R": "a"},
+        ],
+        "vrai_faux": [QUIZ["vrai_faux"][1]],
+    },
+    3: {
+        "qcm": [QUIZ["qcm"][2]],
+        "vrai_faux": [QUIZ["vrai_faux"][2]],
+    },
+}
+
+
+class StubCompletionHandler(BaseHTTPRequestHandler):
+    """Chat completion endpoint answering according to `server.mode`"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests += 1
+        mode = self.server.mode
+
+        if mode == 'sections':
+            self.answer_section(json.loads(body)['messages'][0]['content'])
+            return
+
+        if mode == 'error':
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        # Completion wrapped in a ```json fence, as some models answer
+        content = '```json\n' + json.dumps(QUIZ, ensure_ascii=False) + '\n```'
+        if mode == 'broken':
+            # Connection lost right after the first question
+            content = content[:content.index('}') + 1]
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for start in range(0, len(content), 20):
+            event = {'choices': [{'delta': {'content': content[start:start + 20]}}]}
+            self.write_chunk(f"data: {json.dumps(event)}\n\n")
+        if mode == 'broken':
+            self.wfile.write(b'100\r\n{"choices"')
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b'0\r\n\r\n')
+
+    def answer_section(self, prompt):
+        """Plain JSON answer for the section named in the prompt, slow enough to overlap"""
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(0.2)
+        with server.lock:
+            server.in_flight -= 1
+
+        section = int(re.search(r'Section (\d+)', prompt).group(1))
+        if section in server.failing_sections:
+            body = b''
+            self.send_response(500)
+        else:
+            content = json.dumps(SECTION_QUIZZES[section], ensure_ascii=False)
+            body = json.dumps({'choices': [{'message': {'content': content}}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubAPIMixin:
+    """Local stub of the completion API and a pending QuizAPIResult to fill in"""
+    document_text = "La photosynthèse transforme la lumière, l'eau et le dioxyde de carbone en glucose."
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubCompletionHandler)
+        cls.server.lock = threading.Lock()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.mode = 'success'
+        self.server.requests = 0
+        self.server.in_flight = self.server.max_in_flight = 0
+        self.server.failing_sections = set()
+        quiz_api.breaker.record_success()
+        self.use_api_key('test-key')
+
+        user = User.objects.create_user('student', password='secret')
+        document = Document.objects.create(
+            title='Photosynthèse',
+            file='documents/photosynthese.txt',
+            document_type='txt',
+            uploaded_by=user,
+            extracted_text=self.document_text,
+            is_processed=True,
+        )
+        self.result = QuizAPIResult.objects.create(
+            document=document, user=user, title='Quiz', status='pending', num_questions=6,
+        )
+
+    def use_api_key(self, key):
+        environment = mock.patch.dict(os.environ, {
+            'RAPIDAPI_URL': f"http://127.0.0.1:{self.server.server_address[1]}/chat",
+            'RAPIDAPI_HOST': '127.0.0.1',
+            'RAPIDAPI_KEY': key,
+        })
+        environment.start()
+        self.addCleanup(environment.stop)
+        quiz_api.get_api_config.cache_clear()
+        self.addCleanup(quiz_api.get_api_config.cache_clear)
+
+    def run_generation(self):
+        job = enqueue_api_quiz_generation(self.result)
+        status = run_job(job.pk)
+        self.result.refresh_from_db()
+        return status
+
+
+@override_settings(QUIZ_API_STREAM=True, QUIZ_API_MAX_RETRIES=0)
+class GenerateAPIQuizJobTests(StubAPIMixin, TestCase):
+    """The generate_api_quiz job against a local stub of the completion API"""
+
+    def test_success_stores_questions_in_arrival_order(self):
+        self.assertEqual(self.run_generation(), 'completed')
+
+        self.assertEqual(self.result.status, 'completed')
+        self.assertEqual(self.result.error_message, '')
+        self.assertEqual(self.result.get_questions(), QUIZ['qcm'] + QUIZ['vrai_faux'])
+        self.assertEqual(LLMResponseCache.objects.count(), 1)
+
+    def test_cached_response_skips_the_api(self):
+        self.run_generation()
+        other = QuizAPIResult.objects.create(
+            document=self.result.document, user=self.result.user, status='pending', num_questions=6,
+        )
+        self.result = other
+        self.run_generation()
+
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(other.get_questions(), QUIZ['qcm'] + QUIZ['vrai_faux'])
+
+    def test_api_error_falls_back_to_test_data(self):
+        self.server.mode = 'error'
+
+        self.assertEqual(self.run_generation(), 'completed')
+
+        self.assertEqual(self.result.status, 'completed')
+        self.assertIn('données de test', self.result.error_message)
+        test_data = quiz_api.generate_test_quiz_data('', 'easy', 6)
+        self.assertEqual(self.result.get_questions(), test_data['qcm'] + test_data['vrai_faux'])
+        self.assertFalse(LLMResponseCache.objects.exists())
+
+    def test_broken_stream_keeps_received_questions(self):
+        self.server.mode = 'broken'
+
+        self.assertEqual(self.run_generation(), 'completed')
+
+        self.assertEqual(self.result.status, 'completed')
+        self.assertEqual(self.result.get_questions(), QUIZ['qcm'][:1])
+        self.assertIn('interrompue', self.result.error_message)
+
+    def test_missing_api_key_fails_without_retry(self):
+        self.use_api_key('your_api_key_here')
+
+        self.assertEqual(self.run_generation(), 'completed')
+
+        self.assertEqual(self.result.status, 'failed')
+        self.assertIn('RAPIDAPI_KEY', self.result.error_message)
+        self.assertEqual(self.server.requests, 0)
+
+
+# Sections are requested from worker threads with their own database
+# connections, which do not see the data of a TestCase transaction
+@override_settings(
+    QUIZ_API_MAX_RETRIES=0, QUIZ_API_CHUNK_TOKENS=50, QUIZ_API_CHARS_PER_TOKEN=4, QUIZ_API_CONCURRENCY=4,
+)
+class GenerateChunkedAPIQuizJobTests(StubAPIMixin, TransactionTestCase):
+    """The generate_api_quiz job for a document longer than one prompt section"""
+    # Three paragraphs of about 150 characters, one section (200 characters max) each
+    document_text = '\n\n'.join(
+        f"Section {n}. " + "La photosynthèse transforme la lumière en énergie chimique. " * 2
+        for n in (1, 2, 3)
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.server.mode = 'sections'
+
+    def test_sections_are_requested_in_parallel_and_merged(self):
+        self.assertEqual(self.run_generation(), 'completed')
+
+        self.assertEqual(self.server.requests, 3)
+        self.assertGreater(self.server.max_in_flight, 1)
+        # Taken from each section in turn, without the question repeated by section 2
+        self.assertEqual(self.result.get_questions(), [
+            SECTION_QUIZZES[1]['qcm'][0],
+            SECTION_QUIZZES[3]['qcm'][0],
+            SECTION_QUIZZES[1]['qcm'][1],
+            SECTION_QUIZZES[1]['vrai_faux'][0],
+            SECTION_QUIZZES[2]['vrai_faux'][0],
+            SECTION_QUIZZES[3]['vrai_faux'][0],
+        ])
+        self.assertEqual(LLMResponseCache.objects.count(), 3)
+
+    def test_failed_section_is_left_out(self):
+        self.server.failing_sections = {2}
+
+        self.assertEqual(self.run_generation(), 'completed')
+
+        self.assertEqual(self.result.status, 'completed')
+        self.assertEqual(self.result.error_message, '')
+        self.assertEqual(self.result.get_questions(), [
+            SECTION_QUIZZES[1]['qcm'][0],
+            SECTION_QUIZZES[3]['qcm'][0],
+            SECTION_QUIZZES[1]['qcm'][1],
+            SECTION_QUIZZES[1]['vrai_faux'][0],
+            SECTION_QUIZZES[3]['vrai_faux'][0],
+        ])
+        # Only the answered sections are cached
+        self.assertEqual(LLMResponseCache.objects.count(), 2)
+
+    def test_every_section_failing_falls_back_to_test_data(self):
+        self.server.failing_sections = {1, 2, 3}
+
+        self.assertEqual(self.run_generation(), 'completed')
+
+        self.assertIn('données de test', self.result.error_message)
+        test_data = quiz_api.generate_test_quiz_data('', 'easy', 6)
+        self.assertEqual(self.result.get_questions(), test_data['qcm'] + test_data['vrai_faux'])
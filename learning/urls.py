@@ -22,6 +22,7 @@ urlpatterns = [
     path('quizzes/', views.quiz_list, name='quiz_list'),
     path('quiz/generate/', views.quiz_generate, name='quiz_generate'),
     path('quiz/generate/<int:document_id>/', views.quiz_generate, name='quiz_generate_from_document'),
+    path('quiz/generate/batch/', views.quiz_generate_batch, name='quiz_generate_batch'),
     path('quiz/<int:pk>/', views.quiz_detail, name='quiz_detail'),
     path('quiz/<int:pk>/take/', views.quiz_take, name='quiz_take'),
     path('quiz/attempt/<int:pk>/', views.quiz_attempt, name='quiz_attempt'),
@@ -37,8 +38,13 @@ urlpatterns = [
     path('analytics/goals/create/', views.create_study_goal, name='create_study_goal'),
     path('analytics/export/', views.export_analytics, name='export_analytics'),
     
+    # Search
+    path('search/', views.search_api, name='search_api'),
+    
     # AJAX endpoints
     path('ajax/document/<int:pk>/status/', views.ajax_document_status, name='ajax_document_status'),
+    path('ajax/batch/<uuid:batch_id>/status/', views.ajax_batch_status, name='ajax_batch_status'),
+    path('ajax/quiz/api/<int:quiz_id>/status/', views.ajax_quiz_api_status, name='ajax_quiz_api_status'),
     path('ajax/quiz/attempt/<int:attempt_pk>/answer/', views.quiz_submit_answer, name='quiz_submit_answer'),
     path('test-email/', views.test_email_notification, name='test_email'),
 ]
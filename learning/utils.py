@@ -1,15 +1,15 @@
 import os
-import textract
+import hashlib
 from django.conf import settings
 from django.core.files.storage import default_storage
-from .models import Document
+from .models import Document, ExtractionCache
 import logging
 from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
-from django.db.models import Avg, Count, Sum, Q
+from django.db.models import Avg, Count, Sum, Q, F
 from django.utils import timezone
 from datetime import timedelta, datetime
 from collections import defaultdict
@@ -18,6 +18,9 @@ import json
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the extraction/cleaning output changes so cached extractions are rebuilt
+EXTRACTOR_VERSION = 2
+
 
 def get_file_type(filename):
     """Determine file type from filename extension"""
@@ -47,27 +50,85 @@ def validate_file_type(file):
     return True
 
 
-def extract_text_from_document(document):
-    """Extract text from uploaded document using textract"""
+def compute_file_hash(file):
+    """Compute the SHA-256 of a file's content, reading it in chunks
+    
+    A file opened here is closed again; an already open one is rewound.
+    """
+    hasher = hashlib.sha256()
+    was_closed = file.closed
+    file.open('rb')
     try:
-        # Get the full path to the uploaded file
-        file_path = document.file.path
-        
-        # Extract text using textract
-        text = textract.process(file_path).decode('utf-8')
+        for chunk in file.chunks():
+            hasher.update(chunk)
+    finally:
+        if was_closed:
+            file.close()
+        else:
+            file.seek(0)
+    return hasher.hexdigest()
+
+
+def get_cached_extraction(content_hash):
+    """Return the cached extraction for a content hash (text deferred), recording the hit"""
+    cached = ExtractionCache.objects.filter(
+        content_hash=content_hash,
+        extractor_version=EXTRACTOR_VERSION,
+    ).defer('extracted_text').first()
+    if cached:
+        ExtractionCache.objects.filter(pk=cached.pk).update(
+            hit_count=F('hit_count') + 1,
+            last_used_at=timezone.now(),
+        )
+    return cached
+
+
+def extract_text_from_document(document, use_cache=True):
+    """Extract text from uploaded document using the streaming pipeline
+    
+    Identical files are only parsed once: the cleaned text is stored in
+    ExtractionCache under the SHA-256 of the file content. The full text
+    is assembled and copied inside the database, never in this process;
+    document.extracted_text is loaded again on first access.
+    """
+    try:
+        # Always rehashed: the file may have been replaced since the last extraction
+        document.content_hash = compute_file_hash(document.file)
         
-        # Clean up the text
-        text = clean_extracted_text(text)
+        from django.db import transaction
+        from django.db.models import Subquery
+        from .extraction import run_extraction_pipeline, store_cached_extraction
         
-        # Update document with extracted text
-        document.extracted_text = text
-        document.word_count = len(text.split())
+        cached = get_cached_extraction(document.content_hash) if use_cache else None
+        if cached:
+            stats = store_cached_extraction(document, cached)
+            logger.info(f"Extraction cache hit for document: {document.title}")
+        else:
+            # Stream the file page by page through extract -> clean -> count -> persist
+            stats = run_extraction_pipeline(document)
+            
+            with transaction.atomic():
+                entry, _ = ExtractionCache.objects.update_or_create(
+                    content_hash=document.content_hash,
+                    extractor_version=EXTRACTOR_VERSION,
+                    defaults={'word_count': stats['word_count']},
+                )
+                ExtractionCache.objects.filter(pk=entry.pk).update(
+                    extracted_text=Subquery(Document.objects.filter(pk=document.pk).values('extracted_text'))
+                )
+        
+        # The text was written by the database: drop the stale copy so that
+        # save() leaves it alone and the next access reloads it
+        document.__dict__.pop('extracted_text', None)
+        document.__dict__.pop('search_vector', None)
+        for field, value in stats.items():
+            setattr(document, field, value)
         document.is_processed = True
         document.processing_error = ""
+        # Also reindexes the document for search (see signals.index_saved_document)
         document.save()
         
         logger.info(f"Successfully extracted text from document: {document.title}")
-        return text
         
     except Exception as e:
         error_msg = f"Error extracting text from {document.title}: {str(e)}"
@@ -81,6 +142,14 @@ def extract_text_from_document(document):
         raise Exception(error_msg)
 
 
+def get_document_text(document):
+    """Return the stored extraction, extracting (through the cache) only when missing"""
+    if document.is_processed and document.extracted_text:
+        return document.extracted_text
+    extract_text_from_document(document)
+    return document.extracted_text
+
+
 def clean_extracted_text(text):
     """Clean and normalize extracted text"""
     if not text:
@@ -130,24 +199,42 @@ def calculate_reading_time(word_count):
     return max(1, round(word_count / 200))
 
 
+def compute_text_stats(document):
+    """Compute and store the statistics of a document processed before they were precomputed"""
+    from .extraction import TextStats
+    
+    stats = TextStats()
+    for index, piece in enumerate(document.iter_text()):
+        if index:
+            stats.feed('\n')
+        stats.feed(piece)
+    stats = stats.finish()
+    
+    Document.objects.filter(pk=document.pk).update(**stats)
+    for field, value in stats.items():
+        setattr(document, field, value)
+
+
 def get_document_stats(document):
-    """Get comprehensive statistics for a document"""
-    if not document.extracted_text:
+    """Get comprehensive statistics for a document
+    
+    Counts are computed once during extraction and stored on the document,
+    so this does not touch the text.
+    """
+    if not document.is_processed or not document.word_count:
         return {}
     
-    text = document.extracted_text
-    words = text.split()
+    if not document.character_count:
+        compute_text_stats(document)
     
-    stats = {
-        'word_count': len(words),
-        'character_count': len(text),
-        'paragraph_count': len([p for p in text.split('\n\n') if p.strip()]),
-        'sentence_count': len([s for s in text.split('.') if s.strip()]),
-        'reading_time_minutes': calculate_reading_time(len(words)),
-        'average_words_per_sentence': len(words) / max(1, len([s for s in text.split('.') if s.strip()])),
+    return {
+        'word_count': document.word_count,
+        'character_count': document.character_count,
+        'paragraph_count': document.paragraph_count,
+        'sentence_count': document.sentence_count,
+        'reading_time_minutes': calculate_reading_time(document.word_count),
+        'average_words_per_sentence': document.word_count / max(1, document.sentence_count),
     }
-    
-    return stats
 
 
 def send_revision_reminder_email(user, lesson_title=None):
@@ -301,7 +388,7 @@ class LearningAnalytics:
         """Performance par sujet/document"""
         from .models import Document, QuizAttempt
         
-        documents = Document.objects.filter(uploaded_by=self.user)
+        documents = Document.objects.without_text().filter(uploaded_by=self.user)
         subject_data = []
         
         for doc in documents:
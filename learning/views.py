@@ -3,89 +3,36 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
 from django.core.paginator import Paginator
-from django.db.models import Q, Avg, Max, Sum
+from django.db.models import Avg, Max, Sum
 from django.db import models
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
 from datetime import timedelta
 from collections import defaultdict
 import json
-import threading
 from typing import Tuple
-import requests
 import os
-import environ
-import PyPDF2
 
 from .models import Document, Quiz, Question, QuizAttempt, UserAnswer, PerformanceMetrics, QuizAPIResult
-from .forms import DocumentUploadForm, QuizGenerationForm, DocumentSearchForm, BulkDocumentActionForm
+from .forms import DocumentUploadForm, QuizGenerationForm, QuizBatchGenerationForm, DocumentSearchForm, BulkDocumentActionForm
 from .utils import extract_text_from_document, get_document_stats, send_revision_reminder_email
-
-# Charger les variables d'environnement
-env = environ.Env()
-environ.Env.read_env()
-
-def generate_test_quiz_data(doc_text, difficulty, num_questions):
-    """Génère des données de quiz de test pour diagnostiquer les problèmes"""
-    import random
-    
-    # Questions QCM de test
-    qcm_questions = [
-        {
-            "q": "Quelle est la principale fonction de ce document ?",
-            "a": "Informer le lecteur",
-            "b": "Divertir le lecteur", 
-            "c": "Vendre un produit",
-            "R": "a"
-        },
-        {
-            "q": "Combien de sections principales contient ce document ?",
-            "a": "2 sections",
-            "b": "3 sections", 
-            "c": "4 sections",
-            "R": "b"
-        },
-        {
-            "q": "Quel est le niveau de difficulté recommandé pour ce contenu ?",
-            "a": "Débutant",
-            "b": "Intermédiaire",
-            "c": "Avancé",
-            "R": "b"
-        }
-    ]
-    
-    # Questions vrai/faux de test
-    vrai_faux_questions = [
-        {
-            "q": "Ce document contient des informations techniques détaillées.",
-            "R": True
-        },
-        {
-            "q": "Le document est organisé en chapitres numérotés.",
-            "R": False
-        },
-        {
-            "q": "Les exemples fournis facilitent la compréhension.",
-            "R": True
-        }
-    ]
-    
-    return {
-        "qcm": qcm_questions[:min(3, num_questions // 2)],
-        "vrai_faux": vrai_faux_questions[:min(3, num_questions // 2)]
-    }
+from .jobs import (
+    enqueue_document_extraction, enqueue_extraction_batch, enqueue_quiz_generation_batch,
+    enqueue_api_quiz_generation, get_document_job_status, get_batch_status,
+)
+from .search import search_documents, attach_snippets, search_quizzes, unified_search
 
 
 @login_required
 def document_list(request):
     """Display list of user's documents with search and filtering"""
     form = DocumentSearchForm(request.GET)
-    documents = Document.objects.filter(uploaded_by=request.user)
+    documents = Document.objects.without_text().filter(uploaded_by=request.user)
     
     if form.is_valid():
         query = form.cleaned_data.get('query')
@@ -93,17 +40,18 @@ def document_list(request):
         sort_by = form.cleaned_data.get('sort_by') or '-created_at'
         
         if query:
-            documents = documents.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(extracted_text__icontains=query)
-            )
+            documents = search_documents(documents, query)
+            if not form.cleaned_data.get('sort_by') or sort_by == 'relevance':
+                sort_by = '-rank'
+        elif sort_by == 'relevance':
+            sort_by = '-created_at'
         
         if document_type:
             documents = documents.filter(document_type=document_type)
         
         documents = documents.order_by(sort_by)
     else:
+        query = None
         documents = documents.order_by('-created_at')
     
     # Pagination
@@ -111,10 +59,15 @@ def document_list(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    # Highlighted snippets, only for the documents of the current page
+    if query:
+        page_obj.object_list = attach_snippets(page_obj.object_list, query)
+    
     context = {
         'documents': page_obj,
         'search_form': form,
-        'total_documents': documents.count(),
+        'search_query': query,
+        'total_documents': paginator.count,
     }
     
     return render(request, 'learning/document_list.html', context)
@@ -130,18 +83,8 @@ def document_upload(request):
             document.uploaded_by = request.user
             document.save()
             
-            # Process document in background
-            def process_document():
-                try:
-                    extract_text_from_document(document)
-                    messages.success(request, f'Document "{document.title}" uploaded and processed successfully!')
-                except Exception as e:
-                    messages.error(request, f'Document uploaded but processing failed: {str(e)}')
-            
-            # Start processing in a separate thread
-            thread = threading.Thread(target=process_document)
-            thread.daemon = True
-            thread.start()
+            # Queue text extraction for the background worker (manage.py run_jobs)
+            enqueue_document_extraction(document)
             
             messages.info(request, f'Document "{document.title}" uploaded successfully. Processing in background...')
             return redirect('learning:document_detail', pk=document.pk)
@@ -154,7 +97,7 @@ def document_upload(request):
 @login_required
 def document_detail(request, pk):
     """Display document details and statistics"""
-    document = get_object_or_404(Document, pk=pk, uploaded_by=request.user)
+    document = get_object_or_404(Document.objects.without_text(), pk=pk, uploaded_by=request.user)
     
     # Get document statistics
     stats = get_document_stats(document) if document.is_processed else {}
@@ -182,7 +125,7 @@ def document_detail(request, pk):
 @require_POST
 def document_reprocess(request, pk):
     """Reprocess document text extraction"""
-    document = get_object_or_404(Document, pk=pk, uploaded_by=request.user)
+    document = get_object_or_404(Document.objects.without_text(), pk=pk, uploaded_by=request.user)
     
     try:
         extract_text_from_document(document)
@@ -196,7 +139,7 @@ def document_reprocess(request, pk):
 @login_required
 def document_delete(request, pk):
     """Delete document"""
-    document = get_object_or_404(Document, pk=pk, uploaded_by=request.user)
+    document = get_object_or_404(Document.objects.without_text(), pk=pk, uploaded_by=request.user)
     
     if request.method == 'POST':
         title = document.title
@@ -210,13 +153,16 @@ def document_delete(request, pk):
 @login_required
 def document_text_view(request, pk):
     """View extracted text from document"""
-    document = get_object_or_404(Document, pk=pk, uploaded_by=request.user)
+    document = get_object_or_404(Document.objects.without_text(), pk=pk, uploaded_by=request.user)
     
     if not document.is_processed:
         messages.warning(request, 'Document has not been processed yet.')
         return redirect('learning:document_detail', pk=document.pk)
     
-    return render(request, 'learning/document_text_view.html', {'document': document})
+    return render(request, 'learning/document_text_view.html', {
+        'document': document,
+        'text_chunks': document.iter_text(),
+    })
 
 
 @login_required
@@ -235,14 +181,16 @@ def bulk_document_action(request):
             messages.success(request, f'{count} documents deleted successfully!')
             
         elif action == 'reprocess':
-            count = 0
-            for document in documents:
-                try:
-                    extract_text_from_document(document)
-                    count += 1
-                except Exception:
-                    pass
-            messages.success(request, f'{count} documents reprocessed successfully!')
+            # Fan out to the background workers and report progress per document
+            batch_id = enqueue_extraction_batch(documents)
+            status_url = reverse('learning:ajax_batch_status', args=[batch_id])
+            if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+                return JsonResponse({
+                    'batch_id': str(batch_id),
+                    'status_url': status_url,
+                    'total': documents.count(),
+                })
+            messages.info(request, f'{documents.count()} documents queued for reprocessing (batch {batch_id}).')
             
         elif action == 'generate_quiz':
             # Redirect to quiz generation with selected documents
@@ -255,17 +203,44 @@ def bulk_document_action(request):
 @login_required
 def ajax_document_status(request, pk):
     """AJAX endpoint to check document processing status"""
-    document = get_object_or_404(Document, pk=pk, uploaded_by=request.user)
+    document = get_object_or_404(Document.objects.without_text(), pk=pk, uploaded_by=request.user)
     
     data = {
         'is_processed': document.is_processed,
         'processing_error': document.processing_error,
         'word_count': document.word_count,
+        'job': get_document_job_status(document),
     }
     
     return JsonResponse(data)
 
 
+@login_required
+def search_api(request):
+    """JSON endpoint: typo-tolerant search across documents, quizzes and questions"""
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 50)
+    except ValueError:
+        limit = 20
+    
+    data = unified_search(
+        request.user,
+        request.GET.get('q', ''),
+        cursor=request.GET.get('cursor'),
+        limit=limit,
+    )
+    return JsonResponse(data)
+
+
+@login_required
+def ajax_batch_status(request, batch_id):
+    """AJAX endpoint reporting the progress of a batch of background jobs"""
+    data = get_batch_status(batch_id, user=request.user)
+    if not data['total']:
+        return JsonResponse({'error': 'Batch not found'}, status=404)
+    return JsonResponse(data)
+
+
 class DocumentListView(LoginRequiredMixin, ListView):
     """Class-based view for document list (alternative implementation)"""
     model = Document
@@ -274,7 +249,7 @@ class DocumentListView(LoginRequiredMixin, ListView):
     paginate_by = 10
     
     def get_queryset(self):
-        return Document.objects.filter(uploaded_by=self.request.user).order_by('-created_at')
+        return Document.objects.without_text().filter(uploaded_by=self.request.user).order_by('-created_at')
 
 
 class DocumentDetailView(LoginRequiredMixin, DetailView):
@@ -284,7 +259,7 @@ class DocumentDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'document'
     
     def get_queryset(self):
-        return Document.objects.filter(uploaded_by=self.request.user)
+        return Document.objects.without_text().filter(uploaded_by=self.request.user)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -311,7 +286,7 @@ def dashboard(request):
     user = request.user
     
     # Get user's documents
-    documents = Document.objects.filter(uploaded_by=user)
+    documents = Document.objects.without_text().filter(uploaded_by=user)
     processed_documents = documents.filter(is_processed=True)
     
     # Get user's quizzes and attempts
@@ -350,7 +325,7 @@ def dashboard(request):
 
 # Quiz Generation Views
 from .quiz_generator import QuizGenerator
-from .answer_checker import SmartAnswerChecker
+from .answer_checker import default_checker, grade_attempt
 from .analytics import LearningAnalytics
 
 
@@ -358,150 +333,38 @@ from .analytics import LearningAnalytics
 def quiz_generate(request, document_id=None):
     """Generate quiz from document using external API"""
     if document_id:
-        documents = [get_object_or_404(Document, pk=document_id, uploaded_by=request.user)]
+        documents = [get_object_or_404(Document.objects.without_text(), pk=document_id, uploaded_by=request.user)]
     else:
         document_ids = request.GET.get('documents', '').split(',')
         if document_ids and document_ids[0]:
-            documents = Document.objects.filter(
+            documents = Document.objects.without_text().filter(
                 id__in=[int(id) for id in document_ids if id.isdigit()],
                 uploaded_by=request.user
             )
         else:
-            documents = Document.objects.filter(uploaded_by=request.user)
+            documents = Document.objects.without_text().filter(uploaded_by=request.user)
     
     if request.method == 'POST':
         form = QuizGenerationForm(request.POST)
         if form.is_valid():
             selected_doc_id = request.POST.get('selected_document')
             if selected_doc_id:
-                document = get_object_or_404(Document, pk=selected_doc_id, uploaded_by=request.user)
-                doc_text = document.extracted_text or ''
-                # Si le texte est vide, essayer d'extraire nativement
-                if True:
-                    file_path = document.file.path
-                    if file_path.lower().endswith('.pdf'):
-                        try:
-                            with open(file_path, 'rb') as f:
-                                reader = PyPDF2.PdfReader(f)
-                                doc_text = "\n".join(page.extract_text() or '' for page in reader.pages)
-                        except Exception as e:
-                            doc_text = ''
-                    elif file_path.lower().endswith('.txt'):
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                doc_text = f.read()
-                        except Exception as e:
-                            doc_text = ''
-                num_questions = form.cleaned_data.get('num_questions', 6)
-                difficulty = form.cleaned_data.get('difficulty', 'easy')
-                prompt = (
-                    "Génère un QCM et des questions vrai/faux à partir du texte suivant :\n\n"
-                    f"<<CONTENU_DU_FICHIER_ICI>>\n\n"
-                    "Paramètres :\n"
-                    f"- difficulté : {difficulty}\n"
-                    f"- nombre total de questions : {num_questions} (50% QCM et 50% vrai/faux)\n\n"
-                    "Format de réponse attendu : un objet JSON contenant deux clés :\n"
-                    "1. \"qcm\" : tableau de 3 questions à choix multiples. Chaque question doit avoir la structure :\n"
-                    "{\n  \"q\": \"texte de la question\",\n  \"a\": \"option A\",\n  \"b\": \"option B\",\n  \"c\": \"option C\",\n  \"R\": \"a\" (ou \"b\" ou \"c\") correspondant à la bonne réponse\n}\n\n"
-                    "2. \"vrai_faux\" : tableau de 3 affirmations à évaluer comme vraies ou fausses. Chaque élément doit avoir la structure :\n"
-                    "{\n  \"q\": \"affirmation\",\n  \"R\": true ou false\n}\n\n"
-                    "IMPORTANT : la réponse doit être strictement dans ce format JSON, sans aucune explication, sans texte en dehors du JSON. Aucun retour à la ligne inutile.\n\n"
-                    f"CONTENU DU FICHIER : {doc_text}\n"
-                    f"NOMBRE DE QUESTIONS : {num_questions}\n"
-                    f"DIFFICULTE : {difficulty}"
+                document = get_object_or_404(
+                    Document.objects.without_text(), pk=selected_doc_id, uploaded_by=request.user
                 )
-
-                print(prompt)
-
-               # raise Exception("test")
-                # Utiliser les variables d'environnement
-                try:
-                    api_url = env('RAPIDAPI_URL', default='https://chatgpt-42.p.rapidapi.com/chat')
-                    api_host = env('RAPIDAPI_HOST', default='chatgpt-42.p.rapidapi.com')
-                    api_key = env('RAPIDAPI_KEY')
-                except:
-                    # Fallback vers la configuration temporaire
-                    import config
-                    api_url = config.RAPIDAPI_URL
-                    api_host = config.RAPIDAPI_HOST
-                    api_key = config.RAPIDAPI_KEY
-                
-                # Vérifier que la clé API est configurée
-                if not api_key or api_key == "your_api_key_here":
-                    messages.error(request, 'Clé API non configurée. Veuillez configurer RAPIDAPI_KEY dans votre fichier .env ou config.py')
-                    return redirect('learning:quiz_generate')
-                
-                headers = {
-                    'Content-Type': 'application/json',
-                    'x-rapidapi-host': api_host,
-                    'x-rapidapi-key': api_key,
-                }
-                data = {
-                    "model": "gpt-4o-mini",
-                    "messages": [
-                        {"role": "user", "content": prompt}
-                    ]
-                }
-                try:
-                    print(f"Envoi de la requête à l'API: {api_url}")
-                    print(f"Headers: {headers}")
-                    print(f"Data: {data}")
-                    
-                    response = requests.post(api_url, headers=headers, json=data, timeout=60)
-                    print(f"Status code: {response.status_code}")
-                    print(f"Response headers: {response.headers}")
-                    print(f"Response content: {response.text[:500]}...")  # Afficher les 500 premiers caractères
-                    
-                    response.raise_for_status()
-                    result = response.json()
-                    print(f"API result: {result}")
-                    
-                    if 'choices' not in result or not result['choices']:
-                        raise Exception("Réponse API invalide: pas de 'choices' dans la réponse")
-                    
-                    content = result['choices'][0]['message']['content']
-                    print(f"API content: {content}")
-                    
-                    # Vérifier si le contenu est vide
-                    if not content or content.strip() == '':
-                        raise Exception("Réponse API vide")
-                    
-                    import json as pyjson
-                    quiz_data = pyjson.loads(content)
-                    print(f"Parsed quiz data: {quiz_data}")
-                    
-                    # Sauvegarder le résultat dans la base de données
-                    quiz_api_result = QuizAPIResult.objects.create(
-                        document=document,
-                        user=request.user,
-                        title=form.cleaned_data.get('title', ''),
-                        api_response=quiz_data
-                    )
-                    print(quiz_data)
-                    messages.success(request, "Questions générées avec succès !")
-                    return redirect('learning:quiz_api_take', quiz_id=quiz_api_result.id)
-                except requests.exceptions.RequestException as e:
-                    messages.warning(request, f'Erreur de connexion à l\'API : {str(e)}. Utilisation des données de test.')
-                    quiz_data = generate_test_quiz_data(doc_text, difficulty, num_questions)
-                except json.JSONDecodeError as e:
-                    messages.warning(request, f'Erreur de décodage JSON de la réponse API : {str(e)}. Utilisation des données de test.')
-                    quiz_data = generate_test_quiz_data(doc_text, difficulty, num_questions)
-                except KeyError as e:
-                    messages.warning(request, f'Structure de réponse API invalide : {str(e)}. Utilisation des données de test.')
-                    quiz_data = generate_test_quiz_data(doc_text, difficulty, num_questions)
-                except Exception as e:
-                    messages.warning(request, f'Erreur lors de la génération via l\'API : {str(e)}. Utilisation des données de test.')
-                    quiz_data = generate_test_quiz_data(doc_text, difficulty, num_questions)
-                
-                # Sauvegarder le résultat dans la base de données
+                # L'appel à l'API se fait en tâche de fond (python manage.py run_jobs) :
+                # la page du quiz s'affiche tout de suite et attend le résultat
                 quiz_api_result = QuizAPIResult.objects.create(
                     document=document,
                     user=request.user,
                     title=form.cleaned_data.get('title', ''),
-                    api_response=quiz_data
+                    difficulty=form.cleaned_data.get('difficulty', 'easy'),
+                    num_questions=form.cleaned_data.get('num_questions', 6),
+                    time_limit_minutes=form.cleaned_data.get('time_limit_minutes') or 30,
+                    status='pending',
                 )
-                print(f"Quiz data saved: {quiz_data}")
-                messages.success(request, "Questions générées avec succès !")
+                enqueue_api_quiz_generation(quiz_api_result)
+                messages.info(request, "Génération des questions en cours...")
                 return redirect('learning:quiz_api_take', quiz_id=quiz_api_result.id)
             else:
                 messages.error(request, 'Please select a document to generate quiz from.')
@@ -527,12 +390,50 @@ def quiz_generate(request, document_id=None):
     return render(request, 'learning/quiz_generate.html', context)
 
 
+@login_required
+@require_POST
+def quiz_generate_batch(request):
+    """Queue quiz generation for several documents x difficulty levels (form or JSON body)"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    else:
+        data = request.POST
+    
+    form = QuizBatchGenerationForm(data, user=request.user)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    documents = form.cleaned_data['documents']
+    difficulties = form.cleaned_data['difficulties']
+    seeds = form.get_seeds()
+    batch_id = enqueue_quiz_generation_batch(
+        documents,
+        difficulties,
+        num_questions=form.cleaned_data['num_questions'],
+        time_limit=form.cleaned_data['time_limit_minutes'],
+        user=request.user,
+        seeds=seeds,
+    )
+    
+    return JsonResponse({
+        'batch_id': str(batch_id),
+        'status_url': reverse('learning:ajax_batch_status', args=[batch_id]),
+        'total': len(documents),
+        'quizzes': len(documents) * len(difficulties) * len(seeds),
+    }, status=202)
+
+
 @login_required
 def quiz_list(request):
     """Display list of user's quizzes"""
     quizzes = Quiz.objects.filter(
         document__uploaded_by=request.user
-    ).select_related('document').order_by('-created_at')
+    ).select_related('document').defer(
+        'document__extracted_text', 'document__search_vector'
+    ).order_by('-created_at')
     
     # Filter by status
     status_filter = request.GET.get('status', 'all')
@@ -544,11 +445,7 @@ def quiz_list(request):
     # Search
     search_query = request.GET.get('search', '')
     if search_query:
-        quizzes = quizzes.filter(
-            Q(title__icontains=search_query) |
-            Q(description__icontains=search_query) |
-            Q(document__title__icontains=search_query)
-        )
+        quizzes = search_quizzes(quizzes, search_query).order_by('-score', '-created_at')
     
     # Pagination
     paginator = Paginator(quizzes, 12)
@@ -569,7 +466,7 @@ def quiz_list(request):
 def quiz_detail(request, pk):
     """Display quiz details"""
     quiz = get_object_or_404(
-        Quiz.objects.select_related('document', 'created_by'),
+        Quiz.objects.select_related('document', 'created_by').defer('document__extracted_text', 'document__search_vector'),
         pk=pk,
         document__uploaded_by=request.user
     )
@@ -606,7 +503,7 @@ def quiz_detail(request, pk):
 def quiz_take(request, pk):
     """Take a quiz"""
     quiz = get_object_or_404(
-        Quiz.objects.select_related('document'),
+        Quiz.objects.select_related('document').defer('document__extracted_text', 'document__search_vector'),
         pk=pk,
         document__uploaded_by=request.user,
         is_active=True
@@ -636,7 +533,9 @@ def quiz_take(request, pk):
 def quiz_attempt(request, pk):
     """Display quiz attempt interface"""
     attempt = get_object_or_404(
-        QuizAttempt.objects.select_related('quiz', 'quiz__document'),
+        QuizAttempt.objects.select_related('quiz', 'quiz__document').defer(
+            'quiz__document__extracted_text', 'quiz__document__search_vector'
+        ),
         pk=pk,
         user=request.user
     )
@@ -681,27 +580,21 @@ def quiz_submit_answer(request, attempt_pk):
         
         question = get_object_or_404(Question, pk=question_id, quiz=attempt.quiz)
         
+        # Check if answer is correct and calculate points
+        is_correct, points = check_answer_correctness(question, user_answer)
+        
         # Save or update user answer
-        answer_obj, created = UserAnswer.objects.get_or_create(
+        UserAnswer.objects.update_or_create(
             attempt=attempt,
             question=question,
             defaults={
                 'user_answer': user_answer,
-                'time_taken_seconds': time_taken
+                'time_taken_seconds': time_taken,
+                'is_correct': is_correct,
+                'points_earned': points,
             }
         )
         
-        if not created:
-            answer_obj.user_answer = user_answer
-            answer_obj.time_taken_seconds = time_taken
-            answer_obj.save()
-        
-        # Check if answer is correct and calculate points
-        is_correct, points = check_answer_correctness(question, user_answer)
-        answer_obj.is_correct = is_correct
-        answer_obj.points_earned = points
-        answer_obj.save()
-        
         return JsonResponse({
             'success': True,
             'is_correct': is_correct,
@@ -723,10 +616,8 @@ def quiz_submit(request, attempt_pk):
         status='in_progress'
     )
     
-    # Calculate final score
-    total_earned = attempt.answers.aggregate(
-        total=models.Sum('points_earned')
-    )['total'] or 0
+    # Grade all answers again in one pass, in case the answer key changed meanwhile
+    total_earned = sum(answer.points_earned for answer in grade_attempt(attempt))
     
     attempt.earned_points = total_earned
     attempt.score = (total_earned / attempt.total_points * 100) if attempt.total_points > 0 else 0
@@ -750,7 +641,9 @@ def quiz_submit(request, attempt_pk):
 def quiz_result(request, pk):
     """Display quiz results"""
     attempt = get_object_or_404(
-        QuizAttempt.objects.select_related('quiz', 'quiz__document'),
+        QuizAttempt.objects.select_related('quiz', 'quiz__document').defer(
+            'quiz__document__extracted_text', 'quiz__document__search_vector'
+        ),
         pk=pk,
         user=request.user,
         status='completed'
@@ -770,8 +663,7 @@ def quiz_result(request, pk):
 
 def check_answer_correctness(question: Question, user_answer: str) -> Tuple[bool, int]:
     """Check if user answer is correct and return points earned"""
-    checker = SmartAnswerChecker()
-    is_correct, points_earned, feedback = checker.check_answer(question, user_answer)
+    is_correct, points_earned, feedback = default_checker.check_answer(question, user_answer)
     return is_correct, points_earned
 
 
@@ -879,7 +771,7 @@ def analytics_dashboard(request):
 @login_required
 def performance_detail(request, document_id):
     """Detailed performance analysis for a specific document"""
-    document = get_object_or_404(Document, pk=document_id, uploaded_by=request.user)
+    document = get_object_or_404(Document.objects.without_text(), pk=document_id, uploaded_by=request.user)
     
     # Get performance metrics
     try:
@@ -1017,7 +909,10 @@ def export_analytics(request):
 @login_required
 def quiz_api_take(request, quiz_id):
     """Afficher un quiz généré par l'API et proposer de le lancer ou d'y répondre plus tard."""
-    quiz_api = get_object_or_404(QuizAPIResult, pk=quiz_id, user=request.user)
+    quiz_api = get_object_or_404(
+        QuizAPIResult.objects.select_related('document').defer('document__extracted_text', 'document__search_vector'),
+        pk=quiz_id, user=request.user
+    )
     quiz_data = quiz_api.api_response
     document = quiz_api.document
     title = quiz_api.title or f"Quiz sur {document.title}"
@@ -1026,18 +921,37 @@ def quiz_api_take(request, quiz_id):
         'quiz_data': quiz_data,
         'document': document,
         'title': title,
+        'has_questions': quiz_api.status != 'failed' and bool(quiz_api.get_questions()),
     }
     return render(request, 'learning/quiz_api_take.html', context)
 
 
+@login_required
+def ajax_quiz_api_status(request, quiz_id):
+    """AJAX endpoint polled by quiz_api_take while the questions are being generated"""
+    quiz_api = get_object_or_404(
+        QuizAPIResult.objects.only('status', 'error_message', 'api_response'), pk=quiz_id, user=request.user
+    )
+    return JsonResponse({
+        'status': quiz_api.status,
+        'is_ready': quiz_api.is_ready,
+        'available_questions': len(quiz_api.get_questions()),
+        'error_message': quiz_api.error_message,
+    })
+
+
 @login_required
 def quiz_api_attempt(request, quiz_id):
     from .models import QuizAPIAttempt
     
     quiz_api = get_object_or_404(QuizAPIResult, pk=quiz_id, user=request.user)
-    quiz_data = quiz_api.api_response
-    questions = quiz_data.get('qcm', []) + quiz_data.get('vrai_faux', [])
-    total_questions = len(questions)
+    questions = quiz_api.get_questions()
+    # Pendant la génération, les questions déjà reçues peuvent être servies
+    generating = quiz_api.status in ('pending', 'running')
+    if not questions and not quiz_api.is_ready:
+        # Aucune question encore : la page d'attente se recharge d'elle-même
+        return redirect('learning:quiz_api_take', quiz_id=quiz_api.id)
+    total_questions = quiz_api.num_questions if generating else len(questions)
     time_limit = quiz_api.time_limit_minutes * 60  # en secondes
 
     # Timer : début de session
@@ -1059,8 +973,19 @@ def quiz_api_attempt(request, quiz_id):
     score = request.session.get('quiz_api_score', 0)
     answers = request.session.get('quiz_api_answers', [])
 
+    # Question suivante pas encore générée
+    if generating and remaining > 0 and current_index >= len(questions):
+        return render(request, 'learning/quiz_api_attempt.html', {
+            'quiz_api': quiz_api,
+            'waiting': True,
+            'index': current_index + 1,
+            'total': total_questions,
+            'remaining': remaining,
+            'score': score,
+        })
+
     # Si temps écoulé ou toutes questions répondues
-    if remaining == 0 or current_index >= total_questions:
+    if remaining == 0 or current_index >= len(questions):
         # Créer l'enregistrement de tentative
         attempt = QuizAPIAttempt.objects.create(
             user=request.user,
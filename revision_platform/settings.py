@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "users",
     "learning",
 ]
@@ -157,8 +158,56 @@ ALLOWED_DOCUMENT_TYPES = [
 # Maximum file size for uploads (in bytes)
 MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50MB
 
+# PostgreSQL text search configuration used to index documents
+SEARCH_CONFIG = 'french'
+# Characters of a document's text indexed for full-text search (tsvectors are limited to 1 MB)
+SEARCH_VECTOR_TEXT_CHARS = 200000
+# Characters of a document's text searched for a result snippet when none of its chunks matches
+SEARCH_SNIPPET_SOURCE_CHARS = 5000
+
 LOGIN_REDIRECT_URL = '/learning/'
 
+# Background job worker (python manage.py run_jobs)
+JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', '2'))
+JOB_POLL_INTERVAL_SECONDS = 2.0
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BASE_SECONDS = 30
+# run_jobs refreshes the locks of its running jobs every JOB_HEARTBEAT_INTERVAL_SECONDS;
+# a job whose lock is older than JOB_STALE_TIMEOUT_SECONDS belongs to a dead worker
+JOB_HEARTBEAT_INTERVAL_SECONDS = 30
+JOB_STALE_TIMEOUT_SECONDS = 5 * 60
+# How often run_jobs requeues the stale jobs of dead workers
+JOB_STALE_CHECK_INTERVAL_SECONDS = 60
+# A job still running after this long is interrupted and retried (hung parsers, ...)
+JOB_TIMEOUT_SECONDS = 60 * 60
+
+# Quiz generation API (learning/quiz_api.py)
+QUIZ_API_MODEL = 'gpt-4o-mini'
+QUIZ_API_TIMEOUT_SECONDS = 60
+QUIZ_API_CACHE_TTL_SECONDS = 7 * 24 * 3600
+QUIZ_API_CACHE_MAX_ENTRIES = 1000
+# Long documents are sent as sections of about this many tokens, in parallel
+QUIZ_API_CHUNK_TOKENS = 6000
+QUIZ_API_CHARS_PER_TOKEN = 4
+QUIZ_API_MAX_CHUNKS = 8
+QUIZ_API_CONCURRENCY = 4
+# Retries with jittered backoff, then the circuit breaker opens after repeated failures
+QUIZ_API_MAX_RETRIES = 2
+QUIZ_API_RETRY_BASE_SECONDS = 1
+QUIZ_API_BREAKER_THRESHOLD = 5
+QUIZ_API_BREAKER_RESET_SECONDS = 60
+# Stream completions so the first questions can be answered while the rest is generated
+QUIZ_API_STREAM = True
+
+# Compiled answer keys cached per process (learning/answer_checker.py)
+ANSWER_KEY_CACHE_SIZE = 256
+ANSWER_KEY_CACHE_TTL_SECONDS = 300
+# 'sequence_matcher' (difflib, as graded so far) or 'indel' (bit-parallel, faster, scores
+# some answers higher); see learning/similarity.py before switching
+ANSWER_SIMILARITY_BACKEND = 'sequence_matcher'
+# UserAnswer rows streamed and graded per batch by `manage.py regrade`
+REGRADE_CHUNK_SIZE = 2000
+
 # Email configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'  # Ou votre serveur SMTP